@@ -0,0 +1,60 @@
+"""
+Micro-benchmark of the per-step tool overhead of a chat request, without any network I/O.
+
+Compares sending raw python callables (the ollama SDK rebuilds every schema from signatures and
+docstrings on each call) against the schemas precompiled once by `tool_schemas.compile_tools`.
+
+Usage:
+    python benchmarks/bench_tool_schemas.py [--steps 200]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from ollama._client import _copy_tools
+from ollama._types import ChatRequest
+from tool_groups import MATH_TOOLS, FILE_TOOLS
+from tool_schemas import compile_tools
+
+
+def build_request(tools: list) -> dict:
+    """ Same request construction as `ollama.Client.chat`, minus the HTTP call """
+    return ChatRequest(
+        model="benchmark",
+        messages=[{"role": "user", "content": "What is 2 + 2?"}],
+        tools=list(_copy_tools(tools)),
+    ).model_dump(exclude_none=True)
+
+
+def time_per_step(tools: list, n_steps: int) -> float:
+    build_request(tools)
+    t_start = time.perf_counter()
+    for _ in range(n_steps):
+        build_request(tools)
+    return (time.perf_counter() - t_start) / n_steps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    tools = MATH_TOOLS + FILE_TOOLS
+    before = time_per_step(tools, args.steps)
+    after = time_per_step(compile_tools(tools), args.steps)
+
+    print(json.dumps({
+        "benchmark": "tool_schemas",
+        "n_tools": len(tools),
+        "n_steps": args.steps,
+        "callables_us_per_step": round(before * 1e6, 1),
+        "precompiled_us_per_step": round(after * 1e6, 1),
+        "speedup": round(before / after, 1),
+    }))
+
+
+if __name__ == "__main__":
+    main()
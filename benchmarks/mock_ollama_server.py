@@ -0,0 +1,294 @@
+"""
+In-process fake Ollama HTTP server for benchmarks.
+
+Serves the subset of the Ollama REST API used by the framework (/api/tags, /api/show, /api/chat,
+/api/generate, /api/embed, /api/ps, /api/version) from a background thread. Chat responses are
+produced by a `responder` callable that receives the decoded request body and returns a turn:
+
+    {"content": str, "thinking": str, "tool_calls": [{"name": str, "arguments": dict}]}
+
+Helpers `text_turn`, `tool_call_turn` and `json_turn` build such turns, `scripted_tool_policy` is a
+ready-made responder that calls one tool per user prompt and then answers, and `routed_tool_policy`
+picks the tool to call from the tools offered in the request (e.g. for supervisor and sub-agents
+sharing one server). Requests with a `format` schema are answered with a JSON value conforming to
+the schema (`example_from_schema`) unless a fixed value is given.
+"""
+import json
+import time
+import random
+import socket
+import hashlib
+import threading
+from typing import Callable
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+Turn = dict
+Responder = Callable[[dict], Turn]
+
+
+def text_turn(content: str, *, thinking: str = None) -> Turn:
+    return {"content": content, "thinking": thinking}
+
+
+def tool_call_turn(name: str, arguments: dict, *, content: str = "", thinking: str = None) -> Turn:
+    return {"content": content, "thinking": thinking, "tool_calls": [{"name": name, "arguments": arguments}]}
+
+
+def json_turn(value: dict) -> Turn:
+    return {"content": json.dumps(value)}
+
+
+def example_from_schema(schema: dict, defs: dict = None) -> object:
+    """ Minimal JSON value conforming to a (pydantic generated) JSON schema """
+    defs = schema.get("$defs", {}) if defs is None else defs
+    if "$ref" in schema:
+        return example_from_schema(defs[schema["$ref"].rsplit("/", 1)[-1]], defs)
+    if "default" in schema:
+        return schema["default"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return example_from_schema(schema[key][0], defs)
+    schema_type = schema.get("type", "object")
+    if isinstance(schema_type, list):
+        schema_type = schema_type[0]
+    if schema_type == "object":
+        return {name: example_from_schema(value, defs) for name, value in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [example_from_schema(schema["items"], defs)] * schema.get("minItems", 0) if "items" in schema else []
+    return {"string": "mock", "integer": 0, "number": 0.0, "boolean": False, "null": None}[schema_type]
+
+
+def _structured_turn(request: dict, structured: dict = None) -> Turn:
+    format = request["format"]
+    return json_turn(structured if structured is not None else example_from_schema(format) if isinstance(format, dict) else {})
+
+
+def scripted_tool_policy(tool_name: str, arguments: dict, *, answer: str = "Done.", structured: dict = None, thinking: str = None) -> Responder:
+    """
+    Responder that issues one `tool_name` call after every user message and answers once the tool
+    result is in. Requests with a `format` schema are answered with `structured`, or with a value
+    derived from the schema if None.
+    """
+    return routed_tool_policy({tool_name: arguments}, answer=answer, structured=structured, thinking=thinking, require_offered=False)
+
+
+def routed_tool_policy(calls: dict[str, dict], *, answer: str = "Done.", structured: dict = None, thinking: str = None, require_offered: bool = True) -> Responder:
+    """
+    Responder that, after every user message, calls the first tool of `calls` (name -> arguments)
+    that is offered in the request, and answers directly if none is offered.
+    """
+    def respond(request: dict) -> Turn:
+        if request.get("format"):
+            return _structured_turn(request, structured)
+        if request["messages"][-1]["role"] == "user":
+            offered = {tool["function"]["name"] for tool in request.get("tools") or []}
+            for tool_name, arguments in calls.items():
+                if tool_name in offered or not require_offered:
+                    return tool_call_turn(tool_name, arguments, thinking=thinking)
+        return text_turn(answer, thinking=thinking)
+    return respond
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _prompt_tokens(request: dict) -> int:
+    return sum(len(str(message.get("content") or "")) for message in request.get("messages", [])) // 4 + 1
+
+
+class MockOllamaServer():
+    """
+    Args:
+        responder: Callable producing the chat turn for a request.
+        models: Model names reported by /api/tags.
+        capabilities: Capabilities reported by /api/show.
+        latency_seconds: Delay before every chat/generate response, simulating inference.
+        chunk_delay_seconds: Delay between streamed chunks.
+        chunk_size: Characters of content per streamed chunk.
+        embedding_dim: Dimension of the deterministic fake embeddings.
+    """
+
+    def __init__(
+        self,
+        responder: Responder = None,
+        *,
+        models: list[str] = ("mock:latest",),
+        capabilities: list[str] = ("completion", "tools", "thinking", "vision"),
+        latency_seconds: float = 0.0,
+        chunk_delay_seconds: float = 0.0,
+        chunk_size: int = 8,
+        embedding_dim: int = 64,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ):
+
+        self.responder = responder or (lambda request: text_turn("Hello from the mock server."))
+        self.models = list(models)
+        self.capabilities = list(capabilities)
+        self.latency_seconds = latency_seconds
+        self.chunk_delay_seconds = chunk_delay_seconds
+        self.chunk_size = chunk_size
+        self.embedding_dim = embedding_dim
+        self.request_counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes, avoid Nagle + delayed ACK stalls
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self, "GET")
+
+            def do_POST(self):
+                server._handle(self, "POST")
+
+            def do_HEAD(self):
+                server._handle(self, "HEAD")
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Request handling
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str):
+        path = handler.path.split("?")[0]
+        with self._lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+        length = int(handler.headers.get("Content-Length") or 0)
+        request = json.loads(handler.rfile.read(length) or b"{}")
+
+        if path in ("/", "/api/version"):
+            return self._send_json(handler, {"version": "0.0.0-mock"})
+        if path == "/api/tags":
+            return self._send_json(handler, {"models": [{"model": name, "name": name, "modified_at": _now(), "size": 0} for name in self.models]})
+        if path == "/api/ps":
+            return self._send_json(handler, {"models": [{"model": name, "name": name} for name in self.models]})
+        if path == "/api/show":
+            return self._send_json(handler, {"model_info": {}, "capabilities": self.capabilities})
+        if path == "/api/embed":
+            inputs = request.get("input")
+            inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+            return self._send_json(handler, {"model": request.get("model"), "embeddings": [self._embed(text) for text in inputs]})
+        if path == "/api/generate":
+            time.sleep(self.latency_seconds)
+            return self._send_json(handler, {"model": request.get("model"), "created_at": _now(), "response": "", "done": True, "done_reason": "load"})
+        if path == "/api/chat":
+            return self._chat(handler, request)
+        self._send_json(handler, {"error": f"unknown path {path}"}, status=404)
+
+    def _chat(self, handler: BaseHTTPRequestHandler, request: dict):
+        if request.get("model") and not any(name.startswith(request["model"]) for name in self.models):
+            return self._send_json(handler, {"error": f"model '{request['model']}' not found"}, status=404)
+
+        t_start = time.perf_counter()
+        time.sleep(self.latency_seconds)
+        turn = self.responder(request)
+        content = turn.get("content") or ""
+        thinking = turn.get("thinking") if request.get("think") else None
+        tool_calls = [{"function": {"name": call["name"], "arguments": call["arguments"]}} for call in turn.get("tool_calls") or []]
+        prompt_eval_count = turn.get("prompt_eval_count", _prompt_tokens(request))
+        eval_count = (len(content) + len(thinking or "")) // 4 + 1
+
+        def final(message: dict) -> dict:
+            duration = int((time.perf_counter() - t_start) * 1e9)
+            return {
+                "model": request.get("model"), "created_at": _now(), "message": message,
+                "done": True, "done_reason": "stop",
+                "total_duration": duration, "load_duration": 0,
+                "prompt_eval_count": prompt_eval_count, "prompt_eval_duration": duration // 4,
+                "eval_count": eval_count, "eval_duration": duration - duration // 4,
+            }
+
+        if not request.get("stream", True):
+            message = {"role": "assistant", "content": content}
+            if thinking:
+                message["thinking"] = thinking
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return self._send_json(handler, final(message))
+
+        # NDJSON stream: thinking chunks, content chunks, one chunk per tool call, final chunk
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        for field, text in (("thinking", thinking or ""), ("content", content)):
+            for i in range(0, len(text), self.chunk_size):
+                self._send_chunk(handler, {"model": request.get("model"), "created_at": _now(), "message": {"role": "assistant", "content": "", field: text[i:i + self.chunk_size]}, "done": False})
+        for tool_call in tool_calls:
+            self._send_chunk(handler, {"model": request.get("model"), "created_at": _now(), "message": {"role": "assistant", "content": "", "tool_calls": [tool_call]}, "done": False})
+        self._send_chunk(handler, final({"role": "assistant", "content": ""}))
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+    def _send_chunk(self, handler: BaseHTTPRequestHandler, body: dict):
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        handler.wfile.flush()
+        if self.chunk_delay_seconds:
+            time.sleep(self.chunk_delay_seconds)
+
+    def _send_json(self, handler: BaseHTTPRequestHandler, body: dict, status: int = 200):
+        data = json.dumps(body).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        if handler.command != "HEAD":
+            handler.wfile.write(data)
+
+    def _embed(self, text: str) -> list[float]:
+        """ Deterministic hashed bag-of-words embedding, texts sharing words get similar vectors """
+        vector = [0.0] * self.embedding_dim
+        for word in text.lower().split():
+            seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:8], "little")
+            rng = random.Random(seed)
+            for i in range(self.embedding_dim):
+                vector[i] += rng.gauss(0, 1)
+        norm = sum(x * x for x in vector) ** 0.5 or 1.0
+        return [x / norm for x in vector]
+
+if __name__ == "__main__":
+    with MockOllamaServer() as server:
+        print(f"Mock Ollama server listening on {server.url}, press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,214 @@
+"""
+Framework overhead benchmarks against the in-process mock Ollama server.
+
+Measures:
+- llm_construction: `LLM` construction time with a cold and a warm model registry
+- agent_loop: end-to-end `invoke` time of each agent type for one tool round-trip with zero server
+  latency, i.e. the framework's own overhead including HTTP to localhost
+- tool_dispatch: cost of `Agent._call_tool` compared to calling the tool directly
+- concurrency: `invoke_many` throughput of each agent type (including a supervisor delegating to a
+  sub-agent) for increasing concurrency with a fixed server latency, with thinking enabled and a
+  structured output turn
+- tool_schemas: per-step request construction with raw callables vs precompiled schemas
+
+Every result is printed as one JSON line and, with --output, written to a JSON file for regression
+tracking.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--repeats 20] [--latency 0.05] [--output results.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from ollama import Message
+from pydantic import BaseModel
+from llm import LLM
+from agents import Agent
+from model_registry import ModelRegistry
+from prebuilt_agents import ReActAgent, MathAgent, WritingAgent, CodingAgent, SupervisorAgent
+from mock_ollama_server import MockOllamaServer, scripted_tool_policy, routed_tool_policy
+import bench_tool_schemas
+
+MODEL = "mock:latest"
+
+
+def celcius_to_fahrenheit(celcius: float) -> float:
+    """
+    Convert Celsius to Fahrenheit.
+
+    Args:
+        celcius (float): Temperature in Celsius.
+    Returns:
+        float: Temperature in Fahrenheit.
+    """
+    return (celcius * 9/5) + 32
+
+
+class BenchmarkAnswer(BaseModel):
+    answer: str
+    value: float
+
+
+def summarize(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.mean(samples) * 1e3,
+        "median_ms": statistics.median(samples) * 1e3,
+        "p95_ms": samples[min(len(samples) - 1, int(0.95 * len(samples)))] * 1e3,
+        "min_ms": samples[0] * 1e3,
+    }
+
+
+def bench_llm_construction(server: MockOllamaServer, repeats: int) -> dict:
+    cold = []
+    for _ in range(repeats):
+        t_start = time.perf_counter()
+        LLM(MODEL, host=server.url, registry=ModelRegistry())
+        cold.append(time.perf_counter() - t_start)
+
+    registry = ModelRegistry()
+    LLM(MODEL, host=server.url, registry=registry)
+    warm = []
+    for _ in range(repeats):
+        t_start = time.perf_counter()
+        LLM(MODEL, host=server.url, registry=registry)
+        warm.append(time.perf_counter() - t_start)
+    return {"cold": summarize(cold), "warm": summarize(warm)}
+
+
+def agent_scenarios(workdir: str) -> dict:
+    """ Agent factory and the tool call the mock model makes for it """
+    sample_file = os.path.join(workdir, "sample.txt")
+    with open(sample_file, "w") as f:
+        f.write("benchmark\n" * 100)
+    return {
+        "Agent": (lambda llm, **kwargs: Agent("agent", llm, tools=[celcius_to_fahrenheit], **kwargs), "celcius_to_fahrenheit", {"celcius": 35}),
+        "ReActAgent": (lambda llm, **kwargs: ReActAgent(llm, tools=[celcius_to_fahrenheit], **kwargs), "celcius_to_fahrenheit", {"celcius": 35}),
+        "MathAgent": (lambda llm, **kwargs: MathAgent(llm, **kwargs), "addition", {"a": 1.5, "b": 2.5}),
+        "WritingAgent": (lambda llm, **kwargs: WritingAgent(llm, **kwargs), "read_file", {"file_path": sample_file}),
+        "CodingAgent": (lambda llm, **kwargs: CodingAgent(llm, **kwargs), "python_run", {"code": "sum(range(10))"}),
+    }
+
+
+def bench_agent_loop(repeats: int, workdir: str) -> dict:
+    results = {}
+    for agent_type, (make_agent, tool_name, arguments) in agent_scenarios(workdir).items():
+        with MockOllamaServer(scripted_tool_policy(tool_name, arguments)) as server:
+            llm = LLM(MODEL, host=server.url)
+            make_agent(llm).invoke("warm up")
+            samples = []
+            for _ in range(repeats):
+                agent = make_agent(llm)
+                t_start = time.perf_counter()
+                agent.invoke("Run the benchmark task.")
+                samples.append(time.perf_counter() - t_start)
+            results[agent_type] = summarize(samples)
+    return results
+
+
+def bench_tool_dispatch(repeats: int, workdir: str) -> dict:
+    results = {}
+    with MockOllamaServer() as server:
+        llm = LLM(MODEL, host=server.url)
+        for agent_type, (make_agent, tool_name, arguments) in agent_scenarios(workdir).items():
+            agent = make_agent(llm)
+            tool = agent.available_tools[tool_name]
+            tool_call = Message.ToolCall(function=Message.ToolCall.Function(name=tool_name, arguments=arguments))
+            agent._call_tool(tool_call)
+
+            direct, dispatched = [], []
+            for _ in range(repeats):
+                t_start = time.perf_counter()
+                tool(**arguments)
+                direct.append(time.perf_counter() - t_start)
+                t_start = time.perf_counter()
+                agent._call_tool(tool_call)
+                dispatched.append(time.perf_counter() - t_start)
+            results[agent_type] = {
+                "tool": tool_name,
+                "direct": summarize(direct),
+                "dispatched": summarize(dispatched),
+                "overhead_us": (statistics.median(dispatched) - statistics.median(direct)) * 1e6,
+            }
+    return results
+
+
+def concurrency_scenarios(workdir: str) -> dict:
+    """ `agent_scenarios` plus a supervisor delegating every prompt to a math sub-agent """
+    scenarios = {agent_type: (make_agent, {tool_name: arguments}) for agent_type, (make_agent, tool_name, arguments) in agent_scenarios(workdir).items()}
+    scenarios["SupervisorAgent"] = (
+        lambda llm, **kwargs: SupervisorAgent(llm, [MathAgent(llm)], **kwargs),
+        {"math_agent": {"task": "Add 1.5 and 2.5."}, "addition": {"a": 1.5, "b": 2.5}},
+    )
+    return scenarios
+
+
+def bench_concurrency(n_prompts: int, latency_seconds: float, levels: list[int], workdir: str) -> dict:
+    results = {}
+    prompts = [f"Run benchmark task {i}." for i in range(n_prompts)]
+    for agent_type, (make_agent, calls) in concurrency_scenarios(workdir).items():
+        # Thinking chunks are streamed with every turn and the final answer goes through the structured output turn
+        policy = routed_tool_policy(calls, answer="The task is done.", thinking="Let me work through the task step by step.")
+        with MockOllamaServer(policy, latency_seconds=latency_seconds) as server:
+            llm = LLM(MODEL, host=server.url, use_thinking=True)
+            agent = make_agent(llm, structured_output=BenchmarkAnswer)
+            results[agent_type] = {}
+            for max_concurrency in levels:
+                batch = agent.invoke_many(prompts, max_concurrency=max_concurrency)
+                assert not batch.errors, f"{agent_type} failed at concurrency {max_concurrency}: {batch.errors[0]}"
+                results[agent_type][str(max_concurrency)] = batch.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock inference latency in seconds for the concurrency benchmark")
+    parser.add_argument("--prompts", type=int, default=32, help="Prompts per concurrency level")
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": args.repeats,
+        },
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        with MockOllamaServer() as server:
+            results["llm_construction"] = bench_llm_construction(server, args.repeats)
+        print(json.dumps({"benchmark": "llm_construction", **results["llm_construction"]}))
+
+        results["agent_loop"] = bench_agent_loop(args.repeats, workdir)
+        print(json.dumps({"benchmark": "agent_loop", **results["agent_loop"]}))
+
+        results["tool_dispatch"] = bench_tool_dispatch(args.repeats, workdir)
+        print(json.dumps({"benchmark": "tool_dispatch", **results["tool_dispatch"]}))
+
+        results["concurrency"] = bench_concurrency(args.prompts, args.latency, [1, 2, 4, 8, 16], workdir)
+        print(json.dumps({"benchmark": "concurrency", **results["concurrency"]}))
+
+    tools = bench_tool_schemas.MATH_TOOLS + bench_tool_schemas.FILE_TOOLS
+    results["tool_schemas"] = {
+        "callables_us_per_step": bench_tool_schemas.time_per_step(tools, args.repeats) * 1e6,
+        "precompiled_us_per_step": bench_tool_schemas.time_per_step(bench_tool_schemas.compile_tools(tools), args.repeats) * 1e6,
+    }
+    print(json.dumps({"benchmark": "tool_schemas", **results["tool_schemas"]}))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
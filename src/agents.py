@@ -1,8 +1,42 @@
-from llm import LLM
-from ollama import ChatResponse
-from default_prompts import AGENT_PROMPT, REACT_AGENT_PROMPT
-from typing import Callable
-from pydantic import BaseModel
+import os
+import copy
+import json
+import time
+import hashlib
+import asyncio
+import inspect
+import threading
+import contextlib
+from concurrent.futures import Future
+from llm import LLM, AsyncLLM
+from ollama import ChatResponse, Message, Image
+from default_prompts import AGENT_PROMPT, REACT_AGENT_PROMPT, MEMORY_PROMPT
+from typing import Callable, Iterator, Literal, Any
+from pydantic import BaseModel, ValidationError
+from tool_executor import ToolExecutor, run_coroutine
+from batch import BatchResult, ProgressCallback, run_batch, arun_batch
+from context_window import ContextWindow, estimate_tokens, CHARS_PER_TOKEN
+from tool_schemas import FrozenTool, ArgumentValidator, compile_tools, compile_validator, format_validation_error
+from tracing import Tracer, Span
+from images import load_images
+from memory import MemoryStore
+from session import AgentSession
+from budget import Budget, SubAgentResult
+from tool_cache import ToolResultCache, TOOL_CACHE, is_pure
+from guard_rails import GuardRails, GuardRailError, Verdict
+
+def _role(message: dict | Message) -> str:
+    return message.get("role") if isinstance(message, dict) else message.role
+
+
+class StreamEvent(BaseModel):
+    """ Event yielded by `Agent.stream` """
+    type: Literal["thinking", "content", "tool_call", "tool_result", "done"]
+    content: str = ""
+    tool_name: str | None = None
+    arguments: dict | None = None
+    output: Any = None
+
 
 class Agent():
 
@@ -14,7 +48,20 @@ class Agent():
         system_prompt: str = None,
         *,
         structured_output: BaseModel = None,
+        structured_output_mode: Literal["fast", "extra_call"] = "fast",
         n_max_steps: int = 10,
+        max_tool_concurrency: int = 1,
+        tool_executor: ToolExecutor = None,
+        context_window: ContextWindow = None,
+        tracer: Tracer = None,
+        memory: MemoryStore = None,
+        memory_k: int = 4,
+        short_term_turns: int = 4,
+        session: AgentSession = None,
+        budget: Budget = None,
+        tool_cache: ToolResultCache | None = TOOL_CACHE,
+        speculative_tools: bool = False,
+        guard_rails: GuardRails = None,
         default_system_prompt: bool = False,
         verbose: bool = False,
         ):
@@ -25,8 +72,34 @@ class Agent():
         self.n_max_steps = n_max_steps
         self.messages: list[dict[str, str]] = []
         self.tools = []
+        self.tool_schemas: list[FrozenTool] = []
+        self.tool_validators: dict[str, ArgumentValidator | None] = {}
+        self._tool_support_checked = False
         self.structured_output = structured_output
-        
+        self.structured_output_mode = structured_output_mode
+        self.request_stats: dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self._reset_request_stats()
+        self.tool_executor = tool_executor or ToolExecutor(max_concurrency=max_tool_concurrency)
+        self.context_window = context_window
+        self.tracer = tracer
+        self._span_stack: list[Span] = []
+        self._tool_block = ""
+        self._prefix_fingerprint: str = None
+        self.prefix_stats = {"estimated_prompt_tokens": 0, "prompt_eval_count": 0}
+
+        # Long-term memory replaces all but the last `short_term_turns` turns with retrieved excerpts
+        self.memory = memory
+        self.memory_k = memory_k
+        self.short_term_turns = short_term_turns
+        self._turn_memory_ids: list[list[int]] = []
+        self._turn_start: dict = None
+
+        # Results of pure tools are memoized, and with speculation they start while the model turn is streaming
+        self.tool_cache = tool_cache
+        self.speculative_tools = speculative_tools
+        self.guard_rails = guard_rails
+
 
         # System prompt
         if system_prompt:
@@ -44,74 +117,609 @@ class Agent():
         # Structured output
         if structured_output:
             assert issubclass(structured_output, BaseModel), "Structured output must be a pydantic BaseModel"
+        assert structured_output_mode in ("fast", "extra_call"), f"Unknown structured output mode {structured_output_mode}"
+
+        # Per-request limits
+        self.budget = budget
+        if budget and budget.max_steps is not None:
+            self.n_max_steps = budget.max_steps
+
+        # Persisted session, an existing log is resumed
+        self.session = session
+        if session is not None and session.exists():
+            session.restore(self)
 
 
     def bind_tools(self, tools: list):
 
-        if "tools" not in self.llm.capabilities:
-            raise ValueError(f"Model {self.llm.model_name} does not support tool/function calling")
+        # A lazy LLM is only resolved on first use, the tool support is then checked before the first model call
+        if self.llm.is_resolved:
+            self._check_tool_support()
 
         assert isinstance(tools, list), f"Tools must be a list but got {type(tools)}"
         assert all(callable(tool) for tool in tools), "All tools must be callable"
         if self.tools:
             self.tools += tools
             self.available_tools.update({tool.__name__: tool for tool in tools})
+            self.tool_schemas += compile_tools(tools)
         else:
-            self.tools = tools
+            self.tools = list(tools)
             self.available_tools = {tool.__name__: tool for tool in tools}
+            self.tool_schemas = compile_tools(tools)
+        self.tool_validators = {name: compile_validator(tool) for name, tool in self.available_tools.items()}
+        self._tool_block = json.dumps([schema.model_dump(exclude_none=True) for schema in self.tool_schemas], sort_keys=True)
+
+    def _check_tool_support(self):
+        if "tools" not in self.llm.capabilities:
+            raise ValueError(f"Model {self.llm.model_name} does not support tool/function calling")
+        self._tool_support_checked = True
+
+    @property
+    def prefix_fingerprint(self) -> str:
+        """
+        Hash of the leading system messages and the tool block. Ollama can only reuse its prompt cache
+        when this prefix is byte-identical, so it must stay constant across steps and between sessions
+        of equally configured agents.
+        """
+        system_prompts = []
+        for message in self.messages:
+            if _role(message) != "system":
+                break
+            system_prompts.append(message.get("content") if isinstance(message, dict) else message.content)
+        return hashlib.sha256(json.dumps([system_prompts, self._tool_block]).encode("utf-8")).hexdigest()
+
+    def _check_prefix(self) -> int:
+        """ Warn when the cacheable prefix changed between model calls, returns the estimated prompt tokens """
+        fingerprint = self.prefix_fingerprint
+        if self._prefix_fingerprint is None:
+            self._prefix_fingerprint = fingerprint
+        elif fingerprint != self._prefix_fingerprint:
+            print(f"Warning: System prompt or tools of agent {self.agent_name} changed, the model's prompt cache cannot be reused")
+            self._prefix_fingerprint = fingerprint
+        count = self.context_window.tokens if self.context_window else estimate_tokens
+        return sum(count(message) for message in self.messages) + len(self._tool_block) // CHARS_PER_TOKEN
+
+    def _record_prefix_reuse(self, response: ChatResponse, estimated_prompt_tokens: int, span: Span = None):
+        """ Ollama only counts prompt tokens it had to evaluate, the remainder was served from its cache """
+        if response.prompt_eval_count is None:
+            return
+        self.prefix_stats["estimated_prompt_tokens"] += estimated_prompt_tokens
+        self.prefix_stats["prompt_eval_count"] += response.prompt_eval_count
+        if span:
+            span.set(estimated_prompt_tokens=estimated_prompt_tokens, prefix_reuse_rate=max(0.0, 1 - response.prompt_eval_count / max(1, estimated_prompt_tokens)))
+
+    @property
+    def prefix_reuse_rate(self) -> float:
+        """ Approximate share of prompt tokens served from Ollama's prompt cache over all calls of this agent """
+        estimated = self.prefix_stats["estimated_prompt_tokens"]
+        if not estimated:
+            return 0.0
+        return max(0.0, 1 - self.prefix_stats["prompt_eval_count"] / estimated)
+
+    def fork(self) -> "Agent":
+        """
+        Copy of the agent sharing llm, tool functions and compiled schemas but with its own conversation
+        state, tool containers (binding tools on a fork leaves the agent unchanged) and tool executor
+        """
+        forked = copy.copy(self)
+        forked.messages = list(self.messages)
+        forked.tools = list(self.tools)
+        forked.available_tools = dict(self.available_tools)
+        forked.tool_schemas = list(self.tool_schemas)
+        forked.tool_validators = dict(self.tool_validators)
+        # Concurrent forks would otherwise queue their tool calls on one pool
+        forked.tool_executor = copy.copy(self.tool_executor)
+        forked.tool_executor._pool = None
+        forked._stats_lock = threading.Lock()
+        forked._reset_request_stats()
+        forked._span_stack = []
+        forked.prefix_stats = {"estimated_prompt_tokens": 0, "prompt_eval_count": 0}
+        forked._turn_memory_ids = list(self._turn_memory_ids)
+        forked.session = None
+        if self.context_window is not None:
+            # The token count cache is rebuilt while fitting, concurrent forks must not share it
+            forked.context_window = copy.copy(self.context_window)
+            forked.context_window._token_counts = {}
+        return forked
+
+    @contextlib.contextmanager
+    def _span(self, name: str, *, leaf: bool = False, **attributes) -> Iterator[Span | None]:
+        """ Trace a unit of work when a tracer is attached, leaf spans (model and tool calls) never become parents """
+        if self.tracer is None:
+            yield None
+            return
+        span = self.tracer.start_span(name, parent=self._span_stack[-1] if self._span_stack else None, agent=self.agent_name, **attributes)
+        if not leaf:
+            self._span_stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if not leaf:
+                self._span_stack.pop()
+            self.tracer.end_span(span)
+
+    def _reset_request_stats(self):
+        """ Counters of the current request: model calls made, tokens used and structured-output round-trips saved """
+        self.request_stats = {"model_calls": 0, "round_trips_saved": 0, "prompt_tokens": 0, "completion_tokens": 0, "speculative_tool_calls": 0}
+        self._t_request_start = time.perf_counter()
+
+    def _record_usage(self, response: ChatResponse):
+        self.request_stats["prompt_tokens"] += response.prompt_eval_count or 0
+        self.request_stats["completion_tokens"] += response.eval_count or 0
+
+    def _fit_context(self):
+        """ Trim the history to the context window budget before it is sent to the model """
+        if self.context_window:
+            self.messages = self.context_window.fit(self.messages, self.llm.options.get("num_ctx") or 2048)
+
+    def generate(self, use_format: bool = False, stream: bool = False) -> ChatResponse | Iterator[ChatResponse]:
+        if self.tool_schemas and not self._tool_support_checked:
+            self._check_tool_support()
+        if self.budget:
+            self.budget.check(self.request_stats, self._t_request_start)
+        self._fit_context()
+        self.request_stats["model_calls"] += 1
+        if stream:
+            return self.llm.generate(
+                self.messages,
+                tools=self.tool_schemas,
+                structured_output=self.structured_output if use_format else None,
+                stream=True,
+            )
+        estimated_prompt_tokens = self._check_prefix()
+        with self._span("llm.generate", leaf=True, model=self.llm.model_name, use_format=use_format) as span:
+            response = self.llm.generate(
+                self.messages,
+                tools=self.tool_schemas,
+                structured_output=self.structured_output if use_format else None,
+            )
+            if span:
+                span.record_response(response)
+            self._record_prefix_reuse(response, estimated_prompt_tokens, span)
+            self._record_usage(response)
+            return response
+
+    async def agenerate(self, use_format: bool = False) -> ChatResponse:
+        if self.tool_schemas and not self._tool_support_checked:
+            self._check_tool_support()
+        if self.budget:
+            self.budget.check(self.request_stats, self._t_request_start)
+        self._fit_context()
+        self.request_stats["model_calls"] += 1
+        estimated_prompt_tokens = self._check_prefix()
+        with self._span("llm.generate", leaf=True, model=self.llm.model_name, use_format=use_format) as span:
+            response = await self.llm.generate(
+                self.messages,
+                tools=self.tool_schemas,
+                structured_output=self.structured_output if use_format else None
+            )
+            if span:
+                span.record_response(response)
+            self._record_prefix_reuse(response, estimated_prompt_tokens, span)
+            self._record_usage(response)
+            return response
+
+    def _generate_speculative(self, use_format: bool = False) -> ChatResponse:
+        """ `generate` streamed under the hood, so pure tool calls start as soon as they arrive in the stream """
+        content, thinking, tool_calls = [], [], []
+        chunk = None
+        for chunk in self._stream_turn(use_format=use_format):
+            content.append(chunk.message.content or "")
+            thinking.append(chunk.message.thinking or "")
+            for tool_call in chunk.message.tool_calls or []:
+                tool_calls.append(tool_call)
+                self._speculate(tool_call)
+        if chunk is None:
+            raise RuntimeError(f"Model {self.llm.model_name} of agent {self.agent_name} returned an empty response stream")
+        message = Message(role="assistant", content="".join(content), thinking="".join(thinking) or None, tool_calls=tool_calls or None)
+        return chunk.model_copy(update={"message": message})
+
+    def _generate_turn(self, use_format: bool = False) -> ChatResponse:
+        if self.speculative_tools and self.tool_cache is not None and any(map(is_pure, self.available_tools.values())):
+            return self._generate_speculative(use_format=use_format)
+        return self.generate(use_format=use_format)
+
+    @property
+    def _format_first_turn(self) -> bool:
+        """ Without tools no tool calls can follow, so the JSON format can be requested right away """
+        return bool(self.structured_output) and (self.structured_output_mode == "fast") and not self.tool_schemas
+
+    def _parse_structured_output(self, content: str) -> BaseModel | None:
+        """ Validate a free-text answer against the schema, None if it does not conform """
+        if self.structured_output_mode != "fast":
+            return None
+        content = (content or "").strip()
+        if content.startswith("```"):
+            content = content.strip("`").removeprefix("json").strip()
+        try:
+            output = self.structured_output.model_validate_json(content)
+        except ValidationError:
+            return None
+        self.request_stats["round_trips_saved"] += 1
+        return output
+
+
+    def _trim_short_term(self):
+        """ Keep the leading system messages and the last `short_term_turns` turns, older turns live in memory """
+        n_system = next((i for i, message in enumerate(self.messages) if _role(message) != "system"), len(self.messages))
+        turn_starts = [i for i in range(n_system, len(self.messages)) if _role(self.messages[i]) == "user"]
+        if len(turn_starts) > self.short_term_turns:
+            keep_from = turn_starts[-self.short_term_turns] if self.short_term_turns else len(self.messages)
+            del self.messages[n_system:keep_from]
+
+    def _recall(self, prompt: str) -> str:
+        """ Trim the history and prepend the most relevant long-term memories to the prompt """
+        if self.memory is None:
+            return prompt
+        self._trim_short_term()
+        recent_ids = {memory_id for ids in self._turn_memory_ids for memory_id in ids}
+        memories = self.memory.search(prompt, self.memory_k, session=self.agent_name, exclude_ids=recent_ids)
+        if not memories:
+            return prompt
+        excerpts = "\n".join(f"- {item.role}: {item.content}" for item in sorted(memories, key=lambda item: item.memory_id))
+        return MEMORY_PROMPT.format(memories=excerpts, prompt=prompt).strip()
+
+    def _rollback_turn(self):
+        """ Drop the messages of the current turn, e.g. after a guard rail blocked it """
+        start = next((i for i in range(len(self.messages) - 1, -1, -1) if self.messages[i] is self._turn_start), None)
+        if start is not None:
+            del self.messages[start:]
+
+    def _start_input_guard(self, prompt: str) -> Future | None:
+        """ Check the input, content the cheap tiers cannot decide is classified while the model generates """
+        if self.guard_rails is None:
+            return None
+        pending = self.guard_rails.start("input", prompt)
+        if isinstance(pending, Verdict):
+            self._enforce(pending)
+            return None
+        return pending
 
-    def generate(self, use_format: bool = False) -> ChatResponse:
-        return self.llm.generate(
-            self.messages,
-            tools=self.tools,
-            structured_output=self.structured_output if use_format else None
+    def _enforce(self, verdict: Verdict):
+        """ A blocked turn is rolled back and raised """
+        if not verdict.allowed:
+            self._rollback_turn()
+            raise GuardRailError(verdict)
+
+    def _resolve_guard(self, pending: Future | None):
+        if pending is not None:
+            self._enforce(self.guard_rails.resolve(pending))
+
+    def _guard_tool_call(self, tool_call) -> dict | None:
+        """ Tool message replacing the call if a guard rail blocks it, else None """
+        if self.guard_rails is None:
+            return None
+        name, arguments = tool_call.function.name, tool_call.function.arguments
+        verdict = self.guard_rails.check(
+            "tool_call",
+            f"{name} {json.dumps(arguments, ensure_ascii=False, default=str)}",
+            tool_name=name,
+            arguments=arguments,
+            schema=next((schema for schema in self.tool_schemas if schema.function.name == name), None),
+            tool=self.available_tools.get(name),
         )
+        if verdict.allowed:
+            return None
+        return {'role': 'tool', 'content': f"Error: Tool call blocked by the {verdict.tier} guard rail: {verdict.reason}", 'tool_name': name}
+
+    def _finish_turn(self, prompt: str, output: Any, *, output_checked: bool = False) -> Any:
+        """ Store the finished turn in long-term memory (embedded lazily with the next search) and in the session log """
+        if self.guard_rails is not None and not output_checked:
+            self._enforce(self.guard_rails.check("output", output.model_dump_json() if isinstance(output, BaseModel) else str(output)))
+        if self.session is not None:
+            start = next((i for i in range(len(self.messages) - 1, -1, -1) if self.messages[i] is self._turn_start), None)
+            if start is None:  # replaced while fitting the context window
+                start = max(i for i, message in enumerate(self.messages) if _role(message) == "user")
+            turn_messages = self.messages[start:]
+            self.session.record_turn(self, turn_messages, n_tool_calls=sum(_role(message) == "tool" for message in turn_messages))
+        if self.memory is not None:
+            output_text = output.model_dump_json() if isinstance(output, BaseModel) else str(output)
+            self._turn_memory_ids.append(self.memory.add(
+                [{"role": "user", "content": prompt}, {"role": "assistant", "content": output_text}],
+                session=self.agent_name,
+            ))
+            # Only the turns still in the short-term history have to be excluded from retrieval
+            self._turn_memory_ids = self._turn_memory_ids[max(0, len(self._turn_memory_ids) - self.short_term_turns):]
+        return output
 
+    async def _afinish_turn(self, prompt: str, output: Any) -> Any:
+        """ `_finish_turn` of `ainvoke`, a classifier escalation of the output rail is awaited off the event loop """
+        if self.guard_rails is not None:
+            pending = self.guard_rails.start("output", output.model_dump_json() if isinstance(output, BaseModel) else str(output))
+            self._enforce(await self.guard_rails.aresolve(pending))
+        return self._finish_turn(prompt, output, output_checked=True)
 
-    def invoke(self, prompt: str, *, images: list[bytes] = None) -> str:
+    def _load_images(self, images: list[bytes | str]) -> list[bytes]:
+        """ Image payloads of the user message, file paths go through the cached, downscaling image pipeline """
+        if "vision" not in self.llm.capabilities:
+            raise RuntimeError(f"Model {self.llm.model_name} does not support vision")
+        assert isinstance(images, list), f"Images must be a list but got {type(images)}"
+        assert all(isinstance(image, (bytes, str, os.PathLike)) for image in images), "All images must be bytes or file paths"
+        paths = [image for image in images if not isinstance(image, bytes)]
+        if not paths:
+            return images
+        loaded = iter(load_images(paths))
+        return [image if isinstance(image, bytes) else next(loaded) for image in images]
 
-        # Initial user message
+    def _add_user_message(self, prompt: str, images: list[bytes | str] = None):
+        assert isinstance(prompt, str), f"Prompt must be a string but got {type(prompt)}"
         if images:
-            if "vision" not in self.llm.capabilities:
-                raise RuntimeError(f"Model {self.llm.model_name} does not support vision")
-            assert isinstance(images, list), f"Images must be a list but got {type(images)}"
-            assert all(isinstance(image, bytes) for image in images), "All images must be bytes"
-            assert isinstance(prompt, str), f"Prompt must be a string but got {type(prompt)}"
-            self.messages.append({"role": "user", "content": prompt, "images": images})
+            self.messages.append({"role": "user", "content": prompt, "images": self._load_images(images)})
         else:
-            assert isinstance(prompt, str), f"Prompt must be a string but got {type(prompt)}"
             self.messages.append({"role": "user", "content": prompt})
-        response = self.generate()
-        self.messages.append(response.message)
-
-        # Tool calling loop
-        n_steps = 0
-        while (tool_call_list := response.message.tool_calls) and (n_steps < self.n_max_steps):
-            if self.verbose: print(f"\n[{self.agent_name}] Step {1+n_steps} - Tool calling loop")
-            n_steps += 1
-            for tool_call in tool_call_list:
-                if function_to_call := self.available_tools.get(tool_call.function.name):
-                    if self.verbose:
-                        print(f"Calling tool {tool_call.function.name} with arguments {tool_call.function.arguments}")
-                    output = function_to_call(**tool_call.function.arguments)
-                    if self.verbose:
-                        print(f"Tool {tool_call.function.name} returned {output}")
-                    self.messages.append({'role': 'tool', 'content': str(output), 'tool_name': tool_call.function.name})
+        self._turn_start = self.messages[-1]
+
+    def _tool_message(self, tool_name: str, output: Any) -> dict:
+        """
+        Build the tool message. Images (e.g. from `read_images`) are attached to the message instead of
+        stringified, and the usage of delegated sub-agent requests is added to this request's stats.
+        """
+        if isinstance(output, SubAgentResult):
+            with self._stats_lock:
+                for key, value in output.usage.items():
+                    self.request_stats[f"sub_agent_{key}"] = self.request_stats.get(f"sub_agent_{key}", 0) + value
+        if isinstance(output, list) and output and all(isinstance(x, Image) for x in output):
+            if "vision" not in self.llm.capabilities:
+                return {'role': 'tool', 'content': f"Error: Model {self.llm.model_name} does not support vision", 'tool_name': tool_name}
+            return {'role': 'tool', 'content': f"{len(output)} image(s) attached", 'images': output, 'tool_name': tool_name}
+        return {'role': 'tool', 'content': str(output), 'tool_name': tool_name}
+
+    def _validate_arguments(self, tool_call) -> tuple[dict, str | None]:
+        """ Arguments coerced to the tool's type hints, or the error message for the model if they are invalid """
+        validator = self.tool_validators.get(tool_call.function.name)
+        if validator is None:
+            return tool_call.function.arguments, None
+        try:
+            return validator(tool_call.function.arguments), None
+        except ValidationError as e:
+            return tool_call.function.arguments, format_validation_error(tool_call.function.name, e)
+
+    def _run_sync_tool(self, function_to_call: Callable, arguments: dict) -> Any:
+        """ Call a sync tool, results of pure tools come from (and go to) the tool cache """
+        if self.tool_cache is not None and is_pure(function_to_call):
+            return self.tool_cache.get_or_run(function_to_call, arguments)
+        return function_to_call(**arguments)
+
+    def _speculate(self, tool_call) -> bool:
+        """ Start a pure tool call in the background before the model turn has ended, True if it was started """
+        function_to_call = self.available_tools.get(tool_call.function.name)
+        if not (self.speculative_tools and self.tool_cache is not None and function_to_call is not None and is_pure(function_to_call)):
+            return False
+        arguments, error = self._validate_arguments(tool_call)
+        if error is not None:
+            return False
+        self.tool_cache.prefetch(function_to_call, arguments)
+        with self._stats_lock:
+            self.request_stats["speculative_tool_calls"] += 1
+        return True
+
+    def _call_tool(self, tool_call) -> dict:
+        """ Run a single tool call and return the resulting tool message """
+        if (blocked := self._guard_tool_call(tool_call)) is not None:
+            return blocked
+        if function_to_call := self.available_tools.get(tool_call.function.name):
+            arguments, error = self._validate_arguments(tool_call)
+            if error is not None:
+                return {'role': 'tool', 'content': error, 'tool_name': tool_call.function.name}
+            if self.verbose:
+                print(f"Calling tool {tool_call.function.name} with arguments {arguments}")
+            with self._span("tool.call", leaf=True, tool_name=tool_call.function.name):
+                if inspect.iscoroutinefunction(function_to_call):
+                    output = run_coroutine(function_to_call(**arguments))
+                else:
+                    output = self._run_sync_tool(function_to_call, arguments)
+            if self.verbose:
+                print(f"Tool {tool_call.function.name} returned {output}")
+            return self._tool_message(tool_call.function.name, output)
+        return {'role': 'tool', 'content': f"Function {tool_call.function.name} not found", 'tool_name': tool_call.function.name}
+
+    async def _acall_tool(self, tool_call) -> dict:
+        """ Async counterpart of `_call_tool`, sync tools are moved off the event loop """
+        if self.guard_rails is not None and (blocked := await asyncio.to_thread(self._guard_tool_call, tool_call)) is not None:
+            return blocked
+        if function_to_call := self.available_tools.get(tool_call.function.name):
+            arguments, error = self._validate_arguments(tool_call)
+            if error is not None:
+                return {'role': 'tool', 'content': error, 'tool_name': tool_call.function.name}
+            if self.verbose:
+                print(f"Calling tool {tool_call.function.name} with arguments {arguments}")
+            with self._span("tool.call", leaf=True, tool_name=tool_call.function.name):
+                if inspect.iscoroutinefunction(function_to_call):
+                    output = await function_to_call(**arguments)
                 else:
-                    self.messages.append({'role': 'tool', 'content': f"Function {tool_call.function.name} not found", 'tool_name': tool_call.function.name})
+                    output = await self.tool_executor.run_in_thread(
+                        self._run_sync_tool,
+                        function_to_call=function_to_call,
+                        arguments=arguments,
+                    )
+            if self.verbose:
+                print(f"Tool {tool_call.function.name} returned {output}")
+            return self._tool_message(tool_call.function.name, output)
+        return {'role': 'tool', 'content': f"Function {tool_call.function.name} not found", 'tool_name': tool_call.function.name}
+
+
+    def invoke(self, prompt: str, *, images: list[bytes | str] = None) -> str:
+        with self._span("agent.invoke"):
 
-            response = self.generate()
+            # Initial user message
+            self._reset_request_stats()
+            self._add_user_message(self._recall(prompt), images)
+            guard = self._start_input_guard(prompt)
+            response = self._generate_turn(use_format=self._format_first_turn)
+            self._resolve_guard(guard)
             self.messages.append(response.message)
-        
-        if n_steps == self.n_max_steps:
-            raise RuntimeError(f"Agent {self.agent_name} reached maximum number of steps {self.n_max_steps}")
-        
-        if self.structured_output:
-            response = self.generate(use_format=True)
+
+            # Tool calling loop
+            n_steps = 0
+            while (tool_call_list := response.message.tool_calls) and (n_steps < self.n_max_steps):
+                if self.verbose: print(f"\n[{self.agent_name}] Step {1+n_steps} - Tool calling loop")
+                n_steps += 1
+                with self._span("agent.step", step=n_steps):
+                    self.messages.extend(self.tool_executor.map(self._call_tool, tool_call_list))
+
+                    response = self._generate_turn()
+                    self.messages.append(response.message)
+            
+            if n_steps == self.n_max_steps:
+                raise RuntimeError(f"Agent {self.agent_name} reached maximum number of steps {self.n_max_steps}")
+            
+            if self.structured_output:
+                if (output := self._parse_structured_output(response.message.content)) is not None:
+                    return self._finish_turn(prompt, output)
+                response = self.generate(use_format=True)
+                self.messages.append(response.message)
+                return self._finish_turn(prompt, self.structured_output.model_validate_json(response.message.content))
+
+            return self._finish_turn(prompt, response.message.content)
+
+    def _stream_turn(self, use_format: bool = False) -> Iterator[ChatResponse]:
+        """ Stream one model turn, recording the timings of the final chunk on the model call span """
+        with self._span("llm.generate", leaf=True, model=self.llm.model_name, stream=True, use_format=use_format) as span:
+            t_first_token = t_first_thinking = None
+            chunks = self.generate(use_format=use_format, stream=True)
+            # After `generate` fitted the context, so the estimate matches what is sent
+            estimated_prompt_tokens = self._check_prefix()
+            for chunk in chunks:
+                if chunk.message.thinking and (t_first_thinking is None):
+                    t_first_thinking = time.perf_counter()
+                if (chunk.message.content or chunk.message.tool_calls) and (t_first_token is None):
+                    t_first_token = time.perf_counter()
+                if chunk.done:
+                    if span:
+                        span.record_response(chunk)
+                    self._record_prefix_reuse(chunk, estimated_prompt_tokens, span)
+                    self._record_usage(chunk)
+                yield chunk
+            if span and t_first_thinking:
+                span.set(thinking_seconds=(t_first_token or time.perf_counter()) - t_first_thinking)
+
+    def stream(self, prompt: str, *, images: list[bytes | str] = None) -> Iterator[StreamEvent]:
+        """
+        Streaming version of `invoke`. Thinking and content tokens are yielded as they are generated and
+        each tool call is dispatched as soon as it arrives in the stream, before the model turn has ended.
+        The last event is of type "done" and carries the final output.
+
+        With guard rails that check outputs, the content of each model turn is held back and yielded as
+        one "content" event once the output rail allowed it, so blocked content never reaches the caller.
+        """
+        with self._span("agent.invoke", stream=True):
+
+            # Initial user message
+            self._reset_request_stats()
+            self._add_user_message(self._recall(prompt), images)
+            guard = self._start_input_guard(prompt)
+            hold_content = self.guard_rails is not None and self.guard_rails.applies_to("output")
+
+            # Tool calling loop
+            n_steps = 0
+            while True:
+                content, thinking, tool_calls, pending = [], [], [], []
+                for chunk in self._stream_turn(use_format=self._format_first_turn):
+                    # The input decision is awaited once the model started answering, before anything is yielded
+                    if guard is not None:
+                        self._resolve_guard(guard)
+                        guard = None
+                    if chunk.message.thinking:
+                        thinking.append(chunk.message.thinking)
+                        yield StreamEvent(type="thinking", content=chunk.message.thinking)
+                    if chunk.message.content:
+                        content.append(chunk.message.content)
+                        if not hold_content:
+                            yield StreamEvent(type="content", content=chunk.message.content)
+                    for tool_call in chunk.message.tool_calls or []:
+                        tool_calls.append(tool_call)
+                        yield StreamEvent(type="tool_call", tool_name=tool_call.function.name, arguments=dict(tool_call.function.arguments))
+                        if n_steps < self.n_max_steps:
+                            # Speculated pure calls are picked up from the tool cache, the others are submitted
+                            pending.append(tool_call if self._speculate(tool_call) else self.tool_executor.submit(self._call_tool, tool_call))
+                if hold_content and content:
+                    self._enforce(self.guard_rails.check("output", "".join(content)))
+                    yield StreamEvent(type="content", content="".join(content))
+                self.messages.append(Message(role="assistant", content="".join(content), thinking="".join(thinking) or None, tool_calls=tool_calls or None))
+
+                if not tool_calls:
+                    break
+                if n_steps == self.n_max_steps:
+                    raise RuntimeError(f"Agent {self.agent_name} reached maximum number of steps {self.n_max_steps}")
+                if self.verbose: print(f"\n[{self.agent_name}] Step {1+n_steps} - Tool calling loop")
+                n_steps += 1
+
+                # Tool results in call order
+                for item in pending:
+                    tool_message = item.result() if isinstance(item, Future) else self._call_tool(item)
+                    self.messages.append(tool_message)
+                    yield StreamEvent(type="tool_result", content=tool_message["content"], tool_name=tool_message["tool_name"])
+
+            output = "".join(content)
+            if self.structured_output and ((output := self._parse_structured_output(output)) is None):
+                content = []
+                for chunk in self._stream_turn(use_format=True):
+                    if chunk.message.content:
+                        content.append(chunk.message.content)
+                        if not hold_content:
+                            yield StreamEvent(type="content", content=chunk.message.content)
+                if hold_content and content:
+                    self._enforce(self.guard_rails.check("output", "".join(content)))
+                    yield StreamEvent(type="content", content="".join(content))
+                self.messages.append(Message(role="assistant", content="".join(content)))
+                output = self.structured_output.model_validate_json("".join(content))
+
+            yield StreamEvent(type="done", content="".join(content), output=self._finish_turn(prompt, output, output_checked=hold_content))
+
+    async def ainvoke(self, prompt: str, *, images: list[bytes | str] = None) -> str:
+        """ Async version of `invoke`, requires the agent to be driven by an `AsyncLLM` """
+        assert isinstance(self.llm, AsyncLLM), f"ainvoke requires an AsyncLLM but got {type(self.llm)}"
+        with self._span("agent.invoke"):
+
+            # Initial user message
+            self._reset_request_stats()
+            if images:
+                # File reads and Pillow decoding would stall every other coroutine on the loop
+                images = await asyncio.to_thread(self._load_images, images)
+            self._add_user_message(await asyncio.to_thread(self._recall, prompt) if self.memory else prompt, images)
+            guard = self._start_input_guard(prompt)
+            response = await self.agenerate(use_format=self._format_first_turn)
+            if guard is not None:
+                self._enforce(await self.guard_rails.aresolve(guard))
             self.messages.append(response.message)
-            return self.structured_output.model_validate_json(response.message.content)
 
-        return response.message.content
+            # Tool calling loop
+            n_steps = 0
+            while (tool_call_list := response.message.tool_calls) and (n_steps < self.n_max_steps):
+                if self.verbose: print(f"\n[{self.agent_name}] Step {1+n_steps} - Tool calling loop")
+                n_steps += 1
+                with self._span("agent.step", step=n_steps):
+                    self.messages.extend(await self.tool_executor.amap(self._acall_tool, tool_call_list))
+
+                    response = await self.agenerate()
+                    self.messages.append(response.message)
+
+            if n_steps == self.n_max_steps:
+                raise RuntimeError(f"Agent {self.agent_name} reached maximum number of steps {self.n_max_steps}")
+
+            if self.structured_output:
+                if (output := self._parse_structured_output(response.message.content)) is not None:
+                    return await self._afinish_turn(prompt, output)
+                response = await self.agenerate(use_format=True)
+                self.messages.append(response.message)
+                return await self._afinish_turn(prompt, self.structured_output.model_validate_json(response.message.content))
+
+            return await self._afinish_turn(prompt, response.message.content)
+    def invoke_many(self, prompts: list[str], *, max_concurrency: int = 4, progress_callback: ProgressCallback = None) -> BatchResult:
+        """
+        Run independent prompts concurrently, each on a fork of this agent's current state.
+        Results are returned in input order, failures are recorded per item instead of raised.
+        """
+        assert isinstance(prompts, list), f"Prompts must be a list but got {type(prompts)}"
+        return run_batch(lambda prompt: self.fork().invoke(prompt), prompts, max_concurrency=max_concurrency, progress_callback=progress_callback)
+
+    async def ainvoke_many(self, prompts: list[str], *, max_concurrency: int = 16, progress_callback: ProgressCallback = None) -> BatchResult:
+        """ Async version of `invoke_many`, requires the agent to be driven by an `AsyncLLM` """
+        assert isinstance(prompts, list), f"Prompts must be a list but got {type(prompts)}"
+        return await arun_batch(lambda prompt: self.fork().ainvoke(prompt), prompts, max_concurrency=max_concurrency, progress_callback=progress_callback)
     
 
 
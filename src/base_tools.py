@@ -1,13 +1,26 @@
 import os
+import re
 import math
 import ast
 import io
 import sys
-import signal
+import codecs
+import bisect
+import fnmatch
+import itertools
+import threading
 import contextlib
+import numpy as np
+from typing import Any, Iterator
+from collections import OrderedDict
+from ollama import Image
+from images import load_images
+from tool_cache import pure
+from sandbox_pool import get_sandbox_pool, SandboxError
 
 ### Math tools ###
 
+@pure
 def addition(a: float, b: float) -> float:
     """
     Return the sum of two floats.
@@ -20,6 +33,7 @@ def addition(a: float, b: float) -> float:
     """
     return a + b
 
+@pure
 def subtraction(a: float, b: float) -> float:
     """
     Return the difference between two floats.
@@ -32,6 +46,7 @@ def subtraction(a: float, b: float) -> float:
     """
     return a - b
 
+@pure
 def multiplication(a: float, b: float) -> float:
     """
     Return the product of two floats.
@@ -44,6 +59,7 @@ def multiplication(a: float, b: float) -> float:
     """
     return a * b
 
+@pure
 def division(a: float, b: float) -> float:
     """
     Return the quotient of two floats as a float.
@@ -59,6 +75,7 @@ def division(a: float, b: float) -> float:
     return a / b
 
 
+@pure
 def exponentiation(a: float, b: float) -> float:
     """
     Return the result of raising a to the power of b.
@@ -71,6 +88,7 @@ def exponentiation(a: float, b: float) -> float:
     """
     return math.pow(a, b)
 
+@pure
 def square_root(a: float) -> float:
     """
     Return the square root of a float.
@@ -82,6 +100,7 @@ def square_root(a: float) -> float:
     """
     return math.sqrt(a)
 
+@pure
 def sine(x: float) -> float:
     """
     Return the sine of x (in radians).
@@ -93,6 +112,7 @@ def sine(x: float) -> float:
     """
     return math.sin(x)
 
+@pure
 def cosine(x: float) -> float:
     """
     Return the cosine of x (in radians).
@@ -104,6 +124,7 @@ def cosine(x: float) -> float:
     """
     return math.cos(x)
 
+@pure
 def tangent(x: float) -> float:
     """
     Return the tangent of x (in radians).
@@ -115,6 +136,7 @@ def tangent(x: float) -> float:
     """
     return math.tan(x)
 
+@pure
 def logarithm(a: float, base: float = math.e) -> float:
     """
     Return the logarithm of a with the specified base.
@@ -127,6 +149,7 @@ def logarithm(a: float, base: float = math.e) -> float:
     """
     return math.log(a, base)
 
+@pure
 def absolute_value(a: float) -> float:
     """
     Return the absolute value of a float.
@@ -139,42 +162,453 @@ def absolute_value(a: float) -> float:
     return abs(a)
 
 
+# Array math tools, a whole formula or dataset is computed in one call instead of a chain of scalar calls
+
+_ELEMENTWISE_BINARY = {
+    "add": np.add, "subtract": np.subtract, "multiply": np.multiply, "divide": np.true_divide,
+    "power": np.power, "mod": np.mod, "maximum": np.maximum, "minimum": np.minimum,
+}
+_ELEMENTWISE_UNARY = {
+    "negative": np.negative, "abs": np.abs, "sqrt": np.sqrt, "square": np.square, "exp": np.exp,
+    "log": np.log, "log10": np.log10, "log2": np.log2, "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "arcsin": np.arcsin, "arccos": np.arccos, "arctan": np.arctan, "round": np.round, "floor": np.floor, "ceil": np.ceil,
+}
+_REDUCTIONS = {
+    "sum": np.sum, "product": np.prod, "min": np.min, "max": np.max, "mean": np.mean, "argmin": np.argmin,
+    "argmax": np.argmax, "cumsum": np.cumsum, "cumprod": np.cumprod, "diff": np.diff, "sort": np.sort,
+    "norm": np.linalg.norm, "count": np.size,
+}
+_LINEAR_ALGEBRA = {
+    "dot": np.dot, "matmul": np.matmul, "cross": np.cross, "outer": np.outer, "solve": np.linalg.solve,
+    "lstsq": lambda a, b: np.linalg.lstsq(a, b, rcond=None)[0], "transpose": np.transpose,
+    "inverse": np.linalg.inv, "determinant": np.linalg.det, "eigenvalues": np.linalg.eigvals,
+    "rank": np.linalg.matrix_rank, "trace": np.trace, "norm": np.linalg.norm,
+}
+_EXPRESSION_FUNCTIONS = {
+    **_ELEMENTWISE_UNARY, **_REDUCTIONS, "arctan2": np.arctan2, "maximum": np.maximum, "minimum": np.minimum,
+    "dot": np.dot, "median": np.median, "std": np.std, "var": np.var, "len": np.size,
+    "round": lambda x, decimals=0: np.round(x, int(decimals)),
+}
+_EXPRESSION_CONSTANTS = {"pi": np.pi, "e": np.e}
+_EXPRESSION_BINARY = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide, ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod, ast.Pow: np.power, ast.MatMult: np.matmul,
+}
+_EXPRESSION_UNARY = {ast.UAdd: np.positive, ast.USub: np.negative}
+MAX_EXPRESSION_LENGTH = 10000
+
+
+def _array(values: Any) -> np.ndarray:
+    """ float64 array of a number or (nested) list of numbers, raises ValueError otherwise """
+    return np.asarray(values, dtype=np.float64)
+
+
+def _result(value: Any) -> float | list:
+    """ Plain python float or (nested) list of a numpy result """
+    value = np.asarray(value)
+    if np.iscomplexobj(value):
+        value = np.real_if_close(value)
+        if np.iscomplexobj(value):
+            return np.vectorize(str)(value).tolist()
+    return value.item() if value.ndim == 0 else value.tolist()
+
+
+@pure
+def elementwise(operation: str, a: list[float] | list[list[float]], b: list[float] | list[list[float]] | float = None) -> list[float] | str:
+    """
+    Apply an operation to every element of a list of numbers.
+
+    Args:
+        operation (str): Binary operation on a and b: add, subtract, multiply, divide, power, mod, maximum, minimum.
+            Or unary operation on a: negative, abs, sqrt, square, exp, log, log10, log2, sin, cos, tan, arcsin,
+            arccos, arctan, round, floor, ceil.
+        a (list[float]): The numbers (or a matrix as a list of rows).
+        b (list[float] | float, optional): Second operand of binary operations, a list of the same length as a or a single number.
+    Returns:
+        list[float]: The element-wise results.
+    """
+    try:
+        with np.errstate(all="raise"):
+            if operation in _ELEMENTWISE_BINARY:
+                if b is None:
+                    return f"Error: Operation '{operation}' needs a second operand b"
+                return _result(_ELEMENTWISE_BINARY[operation](_array(a), _array(b)))
+            if operation in _ELEMENTWISE_UNARY:
+                return _result(_ELEMENTWISE_UNARY[operation](_array(a)))
+        return f"Error: Unknown operation '{operation}', available: {', '.join([*_ELEMENTWISE_BINARY, *_ELEMENTWISE_UNARY])}"
+    except Exception as e:
+        return f"Error: {e}"
+
+
+@pure
+def array_reduce(operation: str, values: list[float] | list[list[float]], axis: int = None) -> float | list[float] | str:
+    """
+    Reduce a list of numbers, or compute a running/derived sequence from it.
+
+    Args:
+        operation (str): One of sum, product, min, max, mean, argmin, argmax, cumsum, cumprod, diff, sort, norm, count.
+        values (list[float]): The numbers (or a matrix as a list of rows).
+        axis (int, optional): Axis of a matrix to reduce along (0 for columns, 1 for rows). Defaults to all elements.
+    Returns:
+        float | list[float]: The result of the operation.
+    """
+    if operation not in _REDUCTIONS:
+        return f"Error: Unknown operation '{operation}', available: {', '.join(_REDUCTIONS)}"
+    try:
+        with np.errstate(all="raise"):
+            array = _array(values)
+            if operation in ("diff", "sort"):
+                return _result(_REDUCTIONS[operation](array, axis=-1 if axis is None else axis))
+            return _result(_REDUCTIONS[operation](array, axis=axis))
+    except Exception as e:
+        return f"Error: {e}"
+
+
+@pure
+def array_statistics(values: list[float], other: list[float] = None, ddof: int = 1) -> dict | str:
+    """
+    Return descriptive statistics of a list of numbers.
+
+    Args:
+        values (list[float]): The numbers.
+        other (list[float], optional): A second list of the same length, adds its covariance and Pearson correlation with values.
+        ddof (int, optional): Delta degrees of freedom of std and var, 1 for the sample and 0 for the population. Defaults to 1.
+    Returns:
+        dict: count, sum, mean, median, std, var, min, max, q1 and q3 (and covariance, correlation if other is given).
+    """
+    try:
+        array = _array(values).ravel()
+        if array.size == 0:
+            return "Error: values is empty"
+        q1, median, q3 = np.percentile(array, [25, 50, 75])
+        stats = {
+            "count": array.size,
+            "sum": float(array.sum()),
+            "mean": float(array.mean()),
+            "median": float(median),
+            "std": float(array.std(ddof=ddof)) if array.size > ddof else None,
+            "var": float(array.var(ddof=ddof)) if array.size > ddof else None,
+            "min": float(array.min()),
+            "max": float(array.max()),
+            "q1": float(q1),
+            "q3": float(q3),
+        }
+        if other is not None:
+            other = _array(other).ravel()
+            if other.shape != array.shape:
+                return f"Error: values and other must have the same length, got {array.size} and {other.size}"
+            stats["covariance"] = float(np.cov(array, other, ddof=ddof)[0, 1])
+            stats["correlation"] = float(np.corrcoef(array, other)[0, 1])
+        return stats
+    except Exception as e:
+        return f"Error: {e}"
+
+
+@pure
+def linear_algebra(operation: str, a: list[float] | list[list[float]], b: list[float] | list[list[float]] = None) -> float | list | str:
+    """
+    Vector and matrix operations. Matrices are lists of rows, e.g. [[1, 2], [3, 4]].
+
+    Args:
+        operation (str): With two operands: dot, matmul, cross, outer, solve (x with a @ x = b), lstsq (least squares x of a @ x = b).
+            With one operand: transpose, inverse, determinant, eigenvalues, rank, trace, norm.
+        a (list[float] | list[list[float]]): The first vector or matrix.
+        b (list[float] | list[list[float]], optional): The second vector or matrix.
+    Returns:
+        float | list: The resulting number, vector or matrix.
+    """
+    if operation not in _LINEAR_ALGEBRA:
+        return f"Error: Unknown operation '{operation}', available: {', '.join(_LINEAR_ALGEBRA)}"
+    try:
+        with np.errstate(all="raise"):
+            if operation in ("dot", "matmul", "cross", "outer", "solve", "lstsq"):
+                if b is None:
+                    return f"Error: Operation '{operation}' needs a second operand b"
+                return _result(_LINEAR_ALGEBRA[operation](_array(a), _array(b)))
+            return _result(_LINEAR_ALGEBRA[operation](_array(a)))
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _evaluate_node(node: ast.AST, variables: dict[str, np.ndarray]) -> np.ndarray:
+    """ Evaluate a whitelisted expression node, anything else (attributes, lambdas, ...) raises ValueError """
+    if isinstance(node, ast.Expression):
+        return _evaluate_node(node.body, variables)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return np.float64(node.value)
+    if isinstance(node, ast.Name):
+        if node.id in variables:
+            return variables[node.id]
+        if node.id in _EXPRESSION_CONSTANTS:
+            return np.float64(_EXPRESSION_CONSTANTS[node.id])
+        raise ValueError(f"Unknown name '{node.id}'")
+    if isinstance(node, ast.BinOp) and type(node.op) in _EXPRESSION_BINARY:
+        return _EXPRESSION_BINARY[type(node.op)](_evaluate_node(node.left, variables), _evaluate_node(node.right, variables))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _EXPRESSION_UNARY:
+        return _EXPRESSION_UNARY[type(node.op)](_evaluate_node(node.operand, variables))
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return np.asarray([_evaluate_node(element, variables) for element in node.elts], dtype=np.float64)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        if node.func.id not in _EXPRESSION_FUNCTIONS:
+            raise ValueError(f"Unknown function '{node.func.id}', available: {', '.join(_EXPRESSION_FUNCTIONS)}")
+        return _EXPRESSION_FUNCTIONS[node.func.id](*[_evaluate_node(arg, variables) for arg in node.args])
+    if isinstance(node, ast.Subscript):
+        value = _evaluate_node(node.value, variables)
+        if isinstance(node.slice, ast.Slice):
+            bounds = [None if part is None else int(_evaluate_node(part, variables)) for part in (node.slice.lower, node.slice.upper, node.slice.step)]
+            return value[slice(*bounds)]
+        return value[int(_evaluate_node(node.slice, variables))]
+    raise ValueError(f"Unsupported syntax '{ast.unparse(node)}'")
+
+
+@pure
+def evaluate_expression(expression: str, variables: dict = None) -> float | list | str:
+    """
+    Evaluate a whole math formula in one call. Supports + - * / // % ** and @ (matrix product), parentheses,
+    lists like [1, 2, 3], indexing like x[0] or x[1:3], the constants pi and e, and the functions sqrt, exp,
+    log, log10, log2, sin, cos, tan, arcsin, arccos, arctan, arctan2, abs, square, round(x, decimals), floor, ceil, sum,
+    product, mean, median, std, var, min, max, maximum, minimum, argmin, argmax, cumsum, cumprod, diff, sort,
+    norm, dot, count and len. Operations on lists are element-wise, e.g. "sum((x - mean(x)) ** 2)".
+
+    Args:
+        expression (str): The formula, e.g. "sqrt(a ** 2 + b ** 2)" or "sum(prices * quantities)".
+        variables (dict, optional): Values of the names used in the formula, numbers or lists of numbers, e.g. {"a": 3, "b": [1, 2]}.
+    Returns:
+        float | list: The value of the formula.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        return f"Error: Expression is longer than {MAX_EXPRESSION_LENGTH} characters"
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+        arrays = {name: _array(value) for name, value in (variables or {}).items()}
+        with np.errstate(all="raise"):
+            return _result(_evaluate_node(tree, arrays))
+    except RecursionError:
+        return "Error: Expression is nested too deeply"
+    except Exception as e:
+        return f"Error: {type(e).__name__}: {e}"
+
+
 
 
 ### File tools ###
 
-def read_file(file_path: str) -> str:
+# Large files are only ever touched in chunks of this many bytes
+FILE_CHUNK_BYTES = 1024 * 1024
+# (line, byte offset) of a line start about every FILE_CHUNK_BYTES, so line reads and edits can seek.
+# LRU keyed on (path, mtime_ns, size), a modified file never matches the index of its old version
+LINE_INDEX_MAX_FILES = 256
+_LINE_INDEX: OrderedDict[tuple[str, int, int], list[tuple[int, int]]] = OrderedDict()
+_LINE_INDEX_LOCK = threading.Lock()
+
+
+def _forget_line_index(file_path: str):
+    """ Drop the indexes of a file we modified, its mtime may not have moved on coarse clocks """
+    file_path = os.path.abspath(file_path)
+    with _LINE_INDEX_LOCK:
+        for key in [key for key in _LINE_INDEX if key[0] == file_path]:
+            del _LINE_INDEX[key]
+
+
+def _seek_line(f: io.BufferedIOBase, file_path: str, line: int) -> int:
+    """
+    Position the binary file `f` at the start of zero-based `line`, or at the end of the file if it
+    has fewer lines. Returns the line number actually reached.
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    with _LINE_INDEX_LOCK:
+        if key in _LINE_INDEX:
+            _LINE_INDEX.move_to_end(key)
+        checkpoints = list(_LINE_INDEX.get(key, [(0, 0)]))
+        n_known = len(checkpoints) if key in _LINE_INDEX else 0
+
+    # Extend a private copy of the index by counting newlines chunk-wise, then publish it
+    current, position = checkpoints[-1]
+    f.seek(position)
+    while current < line:
+        chunk = f.read(FILE_CHUNK_BYTES)
+        if not chunk:
+            break
+        if n_newlines := chunk.count(b"\n"):
+            current += n_newlines
+            checkpoints.append((current, f.tell() - len(chunk) + chunk.rfind(b"\n") + 1))
+            position = checkpoints[-1][1]
+    if len(checkpoints) > n_known:
+        with _LINE_INDEX_LOCK:
+            if len(_LINE_INDEX.get(key, ())) < len(checkpoints):
+                _LINE_INDEX[key] = checkpoints
+                _LINE_INDEX.move_to_end(key)
+                while len(_LINE_INDEX) > LINE_INDEX_MAX_FILES:
+                    _LINE_INDEX.popitem(last=False)
+
+    # Walk the remaining lines from the closest checkpoint
+    current, position = checkpoints[bisect.bisect_right(checkpoints, (line, math.inf)) - 1]
+    f.seek(position)
+    while current < line:
+        if not f.readline():
+            break
+        current += 1
+    return current
+
+
+def _shift_tail(f: io.BufferedRandom, start: int, delta: int):
+    """ Move the bytes from `start` to the end of the file by `delta` bytes, one chunk at a time """
+    size = f.seek(0, os.SEEK_END)
+    if delta > 0:
+        position = size
+        while position > start:
+            n = min(FILE_CHUNK_BYTES, position - start)
+            position -= n
+            f.seek(position)
+            chunk = f.read(n)
+            f.seek(position + delta)
+            f.write(chunk)
+    elif delta < 0:
+        position = start
+        while position < size:
+            n = min(FILE_CHUNK_BYTES, size - position)
+            f.seek(position)
+            chunk = f.read(n)
+            f.seek(position + delta)
+            f.write(chunk)
+            position += n
+        f.truncate(size + delta)
+
+
+def _splice(file_path: str, start_line: int, end_line: int, text: str) -> int:
+    """
+    Replace lines [start_line, end_line) with `text` in place. Only the part of the file after the
+    edit is moved, and not at all when the replacement has the same length. Returns the first line.
+    """
+    data = text.encode("utf-8")
+    with open(file_path, "r+b") as f:
+        if start_line < 0 or end_line < 0:
+            n_lines = _seek_line(f, file_path, sys.maxsize)
+            start_line = max(0, start_line + n_lines) if start_line < 0 else start_line
+            end_line = max(0, end_line + n_lines) if end_line < 0 else end_line
+        _seek_line(f, file_path, start_line)
+        start = f.tell()
+        _seek_line(f, file_path, max(start_line, end_line))
+        end = f.tell()
+        _shift_tail(f, end, len(data) - (end - start))
+        f.seek(start)
+        f.write(data)
+    _forget_line_index(file_path)
+    return start_line
+
+
+def read_file(file_path: str, offset: int = 0, length: int = 10000) -> str:
+    """
+    Read a chunk of a text file, by default the first 10,000 bytes. Use `offset` to continue reading large files.
+
+    Args:
+        file_path (str): The path to the file to read.
+        offset (int, optional): Byte offset to start reading from. Defaults to 0.
+        length (int, optional): Maximum number of bytes to read. Defaults to 10000.
+
+    Returns:
+        str: The file content (prefixed with 'File content:'). If the file continues, a final note gives the
+             offset to pass for the next chunk. Returns an error message string if reading fails.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, offset))
+            data = f.read(max(0, length))
+        # Do not split a multi-byte character at the end of the chunk
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        text = decoder.decode(data, final=False)
+        next_offset = max(0, offset) + len(data) - len(decoder.getstate()[0])
+        if next_offset < size:
+            text += f"\n[... {size - next_offset} more bytes, call read_file with offset={next_offset} to continue]"
+        return f"File content:\n{text}"
+    except Exception as e:
+        return f"Error while reading file: {e}"
+
+def read_lines(file_path: str, start_line: int = 0, n_lines: int = 200) -> str:
     """
-    Read the content of a text file and return up to the first 10,000 characters.
+    Read a range of lines from a text file, each prefixed with its zero-based line number.
 
     Args:
         file_path (str): The path to the file to read.
+        start_line (int, optional): Zero-based index of the first line to read. Defaults to 0.
+        n_lines (int, optional): Maximum number of lines to read. Defaults to 200.
 
     Returns:
-        str: The file content (prefixed with 'File content:') truncated to 10,000 characters.
-             Returns an error message string if reading fails.
+        str: The numbered lines, or an error message string if reading fails.
     """
     try:
-        with open(file_path, "r") as f:
-            text = f.read()
-        return f"File content:\n{text[:10000]}"
+        lines = []
+        with open(file_path, "rb") as f:
+            line_number = _seek_line(f, file_path, max(0, start_line))
+            for line in itertools.islice(f, max(0, n_lines)):
+                lines.append(f"{line_number}: {line.decode('utf-8', errors='replace').rstrip(chr(10) + chr(13))}")
+                line_number += 1
+            more = bool(f.read(1))
+        if not lines:
+            return f"No lines from line {start_line}, the file has {line_number} lines"
+        if more:
+            lines.append(f"[... call read_lines with start_line={line_number} to continue]")
+        return "\n".join(lines)
     except Exception as e:
         return f"Error while reading file: {e}"
 
-def read_images(image_paths: list[str]) -> list[str]:
+def grep_file(file_path: str, pattern: str, ignore_case: bool = False, max_matches: int = 50) -> str:
+    """
+    Search a text file for lines matching a regular expression, without loading the file into memory.
+
+    Args:
+        file_path (str): The path to the file to search.
+        pattern (str): Regular expression to search for.
+        ignore_case (bool, optional): Match case-insensitively. Defaults to False.
+        max_matches (int, optional): Stop after this many matching lines. Defaults to 50.
+
+    Returns:
+        str: Matching lines prefixed with their zero-based line numbers, or a message if nothing matched.
+             Returns an error message string if the search fails.
     """
-    Read a list of image files as text via `read_file` and return their contents.
+    try:
+        regex = re.compile(pattern.encode("utf-8"), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        matches = []
+        line_number = 0
+        remainder = b""
+        with open(file_path, "rb") as f:
+            while len(matches) < max_matches:
+                chunk = f.read(FILE_CHUNK_BYTES)
+                # Scan whole chunks of complete lines, only split the chunks that contain a match
+                block = remainder + chunk
+                cut = len(block) if not chunk else block.rfind(b"\n") + 1
+                block, remainder = block[:cut], block[cut:]
+                if block and regex.search(block):
+                    lines = block.split(b"\n")
+                    for i, line in enumerate(lines[:-1] if block.endswith(b"\n") else lines, start=line_number):
+                        if regex.search(line):
+                            matches.append(f"{i}: {line[:500].decode('utf-8', errors='replace').rstrip(chr(13))}")
+                            if len(matches) >= max_matches:
+                                matches.append(f"[... stopped after {max_matches} matches]")
+                                break
+                line_number += block.count(b"\n")
+                if not chunk:
+                    break
+        return "\n".join(matches) if matches else f"No lines matching '{pattern}' in {file_path}"
+    except Exception as e:
+        return f"Error while searching file: {e}"
 
-    Note: This function uses `read_file` internally and therefore returns text content,
-    which is appropriate if your images are not binary or are being handled as text.
+def read_images(image_paths: list[str]) -> list[Image] | str:
+    """
+    Load image files so they can be viewed. Large images are downscaled before they are attached to the conversation.
 
     Args:
-        image_paths (list[str]): List of file paths to read.
+        image_paths (list[str]): List of image file paths (PNG, JPEG, WEBP, ...) to load.
 
     Returns:
-        list[str]: A list of strings with each file's content (or error message).
+        list[Image] | str: The loaded images, attached to the tool result, or an error message string if loading fails.
     """
-    return [read_file(image_path) for image_path in image_paths]
+    try:
+        return [Image(value=payload) for payload in load_images(image_paths)]
+    except Exception as e:
+        return f"Error while reading images: {e}"
 
 def write_file(file_path: str, text: str) -> str:
     """
@@ -225,37 +659,91 @@ def edit_file(file_path: str, text: str, insert_at_line: int) -> str:
         str: A success message containing the file path and insertion line, or an error message if editing fails.
     """
     try:
-        with open(file_path, "r") as f:
-            lines = f.readlines()
-        lines.insert(insert_at_line, text)
-        with open(file_path, "w") as f:
-            f.writelines(lines)
-        return f"Text successfully inserted into file at path {file_path} at line {insert_at_line}"
+        line = _splice(file_path, insert_at_line, insert_at_line, text)
+        return f"Text successfully inserted into file at path {file_path} at line {line}"
     except Exception as e:
         return f"Error while editing file: {e}"
 
+def replace_lines(file_path: str, start_line: int, end_line: int, text: str) -> str:
+    """
+    Replace a range of lines in a file with new text.
 
-def list_files(directory: str) -> list[str]:
+    Args:
+        file_path (str): The path to the file to edit.
+        start_line (int): Zero-based index of the first line to replace.
+        end_line (int): Zero-based index of the line after the last replaced line (exclusive).
+        text (str): The replacement text, include trailing newlines to keep lines separate.
+
+    Returns:
+        str: A success message containing the file path and replaced line range, or an error message if editing fails.
     """
-    List files in a directory with basic metadata for each item.
+    try:
+        if end_line < start_line:
+            return f"Error while editing file: end_line {end_line} is before start_line {start_line}"
+        _splice(file_path, start_line, end_line, text)
+        return f"Lines {start_line} to {end_line} successfully replaced in file at path {file_path}"
+    except Exception as e:
+        return f"Error while editing file: {e}"
+
+
+def _walk(directory: str, recursive: bool, max_depth: int | None) -> Iterator[tuple[str, os.DirEntry]]:
+    """ Depth-first walk yielding (relative path, entry) in a stable, name-sorted order """
+    stack = [("", 0)]
+    while stack:
+        relative_dir, depth = stack.pop()
+        try:
+            with os.scandir(os.path.join(directory, relative_dir) if relative_dir else directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            if not relative_dir:
+                raise
+            continue
+        subdirs = []
+        for entry in entries:
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            yield relative_path, entry
+            if recursive and (max_depth is None or depth < max_depth) and entry.is_dir(follow_symlinks=False):
+                subdirs.append((relative_path, depth + 1))
+        stack.extend(reversed(subdirs))
 
-    Note: The return type is a list of dictionaries containing 'name', 'is_dir', and 'size'.
+
+def list_files(directory: str, recursive: bool = False, pattern: str = None, max_depth: int = None, offset: int = 0, limit: int = 200) -> dict:
+    """
+    List files in a directory with basic metadata for each item, optionally recursively and filtered by a glob pattern.
 
     Args:
         directory (str): The directory path to list.
+        recursive (bool, optional): Also list the contents of subdirectories. Defaults to False.
+        pattern (str, optional): Glob pattern the item names must match, e.g. '*.py'. Patterns containing '/' are matched against the relative path. Defaults to None (all items).
+        max_depth (int, optional): Maximum subdirectory depth for recursive listings, 0 lists only the directory itself. Defaults to None (unlimited).
+        offset (int, optional): Number of matching items to skip, used for pagination. Defaults to 0.
+        limit (int, optional): Maximum number of items to return. Defaults to 200.
 
     Returns:
-        list[dict] | str: A list of dictionaries with keys:
-            - name (str): File or directory name.
-            - is_dir (bool): True if the item is a directory.
-            - size (int): File size in bytes (0 for directories on some systems).
+        dict | str: A dictionary with keys:
+            - entries (list[dict]): Items with keys 'name' (path relative to directory), 'is_dir' (bool) and 'size' (int, bytes, 0 for directories).
+            - next_offset (int | None): Offset for the next page, None if all items were listed.
         Returns an error message string if listing fails.
     """
     try:
         items = []
-        for file in os.listdir(directory):
-            items.append({"name": file, "is_dir": os.path.isdir(file), "size": os.path.getsize(file)})
-        return items
+        n_matched = 0
+        for relative_path, entry in _walk(directory, recursive, max_depth):
+            if pattern and not fnmatch.fnmatch(relative_path if "/" in pattern else entry.name, pattern):
+                continue
+            n_matched += 1
+            if n_matched <= offset:
+                continue
+            if len(items) == limit:
+                return {"entries": items, "next_offset": offset + limit}
+            # DirEntry caches the type from the directory listing, only files need a stat call
+            is_dir = entry.is_dir()
+            try:
+                size = 0 if is_dir else entry.stat().st_size
+            except OSError:  # broken symlink
+                size = 0
+            items.append({"name": relative_path, "is_dir": is_dir, "size": size})
+        return {"entries": items, "next_offset": None}
     except Exception as e:
         return f"Error while listing files: {e}"
 
@@ -294,29 +782,15 @@ def _assert_safe_imports(code: str, *, allowed: set[str] | None, denied: set[str
                     raise ValueError(f"Import of module '{mod}' is not in the allowed list.")
 
 
-def python_run(
+def _run_code(
     code: str,
     *,
     allowed_imports: list[str] | None = None,
     denied_imports: list[str] | None = None,
-    timeout_seconds: int = 2,
 ) -> str:
     """
-    Execute a Python code snippet in a constrained environment.
-
-    Behavior:
-    - Blocks dangerous imports and builtins. You may optionally pass an allowlist of importable modules.
-    - Captures stdout and stderr. If code is a single expression, returns its value; otherwise, returns captured output.
-    - Enforces a CPU-time timeout using signal.alarm on Unix systems.
-
-    Args:
-        code: The Python code to run. If it is a single expression, its value is returned.
-        allowed_imports: If provided, only these top-level modules may be imported (e.g., ["math", "json"]).
-        denied_imports: These modules are explicitly denied regardless of allowlist.
-        timeout_seconds: Max seconds to run before timing out.
-
-    Returns:
-        str: The result of the expression or the captured stdout. Errors are returned as strings prefixed with 'Error:'.
+    Run a code snippet with restricted imports and builtins. Executed inside a sandbox worker
+    process, limits and timeouts are enforced by `sandbox_pool.SandboxPool`.
     """
 
     # Default-deny list of sensitive modules
@@ -402,70 +876,81 @@ def python_run(
     exec_globals = {"__builtins__": safe_builtins, **preloaded_modules}
     exec_locals: dict = {}
 
-    # Define a timeout via signal.alarm (Unix-only, main thread requirement)
-    def _timeout_handler(signum, frame):
-        raise TimeoutError("Execution timed out")
-
-    previous_handler = signal.getsignal(signal.SIGALRM)
+    # Determine if code is a single expression
+    is_expr = False
     try:
-        if timeout_seconds and timeout_seconds > 0:
-            signal.signal(signal.SIGALRM, _timeout_handler)
-            signal.alarm(timeout_seconds)
-
-        # Determine if code is a single expression
-        is_expr = False
-        try:
-            compiled_expr = compile(code, "<user_code>", mode="eval")
-            is_expr = True
-        except SyntaxError:
-            compiled_expr = compile(code, "<user_code>", mode="exec")
-
-        stdout_buffer = io.StringIO()
-        stderr_buffer = io.StringIO()
-        with contextlib.redirect_stdout(stdout_buffer), contextlib.redirect_stderr(stderr_buffer):
-            if is_expr:
-                try:
-                    value = eval(compiled_expr, exec_globals, exec_locals)
-                except Exception as e:
-                    return f"Error: {e}"
-                finally:
-                    signal.alarm(0)
-                # Prefer stringified value; if empty, fall back to captured output
-                value_str = repr(value)
-                out = stdout_buffer.getvalue()
-                err = stderr_buffer.getvalue()
-                if err:
-                    return f"Error: {err.strip()}"
-                return value_str if value_str is not None else out
-            else:
+        compiled_expr = compile(code, "<user_code>", mode="eval")
+        is_expr = True
+    except SyntaxError:
+        compiled_expr = compile(code, "<user_code>", mode="exec")
+
+    stdout_buffer = io.StringIO()
+    stderr_buffer = io.StringIO()
+    with contextlib.redirect_stdout(stdout_buffer), contextlib.redirect_stderr(stderr_buffer):
+        if is_expr:
+            try:
+                value = eval(compiled_expr, exec_globals, exec_locals)
+            except Exception as e:
+                # The type matters for errors without a message, e.g. MemoryError from the rlimit
+                return f"Error: {type(e).__name__}: {e}"
+            # Prefer stringified value; if empty, fall back to captured output
+            value_str = repr(value)
+            out = stdout_buffer.getvalue()
+            err = stderr_buffer.getvalue()
+            if err:
+                return f"Error: {err.strip()}"
+            return value_str if value_str is not None else out
+        else:
+            try:
+                exec(compiled_expr, exec_globals, exec_locals)
+            except Exception as e:
+                return f"Error: {type(e).__name__}: {e}"
+            out = stdout_buffer.getvalue()
+            err = stderr_buffer.getvalue()
+            if err:
+                return f"Error: {err.strip()}"
+            # If the user set a variable named 'result', return it; else return stdout
+            if "result" in exec_locals:
                 try:
-                    exec(compiled_expr, exec_globals, exec_locals)
-                except Exception as e:
-                    return f"Error: {e}"
-                finally:
-                    signal.alarm(0)
-                out = stdout_buffer.getvalue()
-                err = stderr_buffer.getvalue()
-                if err:
-                    return f"Error: {err.strip()}"
-                # If the user set a variable named 'result', return it; else return stdout
-                if "result" in exec_locals:
-                    try:
-                        return repr(exec_locals["result"])  # represent safely
-                    except Exception:
-                        return str(exec_locals["result"])  # fallback
-                return out if out else ""
-    finally:
-        # Restore previous alarm handler
-        try:
-            signal.alarm(0)
-        except Exception:
-            pass
-        try:
-            if previous_handler is not None:
-                signal.signal(signal.SIGALRM, previous_handler)
-        except Exception:
-            pass
+                    return repr(exec_locals["result"])  # represent safely
+                except Exception:
+                    return str(exec_locals["result"])  # fallback
+            return out if out else ""
+
+
+def python_run(
+    code: str,
+    *,
+    allowed_imports: list[str] | None = None,
+    denied_imports: list[str] | None = None,
+    timeout_seconds: int = 2,
+) -> str:
+    """
+    Execute a Python code snippet in a constrained environment.
+
+    Behavior:
+    - Blocks dangerous imports and builtins. You may optionally pass an allowlist of importable modules.
+    - Captures stdout and stderr. If code is a single expression, returns its value; otherwise, returns captured output.
+    - Runs in a separate sandbox worker process with memory and CPU limits and a wall-clock timeout.
+
+    Args:
+        code: The Python code to run. If it is a single expression, its value is returned.
+        allowed_imports: If provided, only these top-level modules may be imported (e.g., ["math", "json"]).
+        denied_imports: These modules are explicitly denied regardless of allowlist.
+        timeout_seconds: Max seconds to run before timing out.
+
+    Returns:
+        str: The result of the expression or the captured stdout. Errors are returned as strings prefixed with 'Error:'.
+    """
+    try:
+        return get_sandbox_pool(_run_code).run(
+            code,
+            allowed_imports=allowed_imports,
+            denied_imports=denied_imports,
+            timeout=timeout_seconds if (timeout_seconds and timeout_seconds > 0) else None,
+        )
+    except (TimeoutError, SandboxError) as e:
+        return f"Error: {e}"
 
 
 if __name__ == "__main__":
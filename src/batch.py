@@ -0,0 +1,100 @@
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Awaitable, Any
+from concurrent.futures import ThreadPoolExecutor
+
+
+@dataclass
+class BatchItem:
+    """ Outcome of a single prompt in a batch, `error` is set instead of raising """
+    index: int
+    prompt: str
+    output: Any = None
+    error: Exception | None = None
+    latency_seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BatchResult:
+    """ Items in input order together with overall throughput statistics """
+    items: list[BatchItem] = field(default_factory=list)
+    wall_time_seconds: float = 0.0
+
+    @property
+    def outputs(self) -> list[Any]:
+        return [item.output for item in self.items]
+
+    @property
+    def errors(self) -> list[BatchItem]:
+        return [item for item in self.items if not item.ok]
+
+    def stats(self) -> dict:
+        n_items = len(self.items)
+        return {
+            "n_items": n_items,
+            "n_succeeded": n_items - len(self.errors),
+            "n_failed": len(self.errors),
+            "wall_time_seconds": self.wall_time_seconds,
+            "throughput_per_second": n_items / self.wall_time_seconds if self.wall_time_seconds else 0.0,
+            "mean_latency_seconds": sum(item.latency_seconds for item in self.items) / n_items if n_items else 0.0,
+        }
+
+
+ProgressCallback = Callable[[int, int, BatchItem], None]
+
+
+def run_batch(fn: Callable[[str], Any], prompts: list[str], *, max_concurrency: int = 4, progress_callback: ProgressCallback = None) -> BatchResult:
+    """ Run `fn` over all prompts on a worker pool, collecting per-item outputs and errors """
+    assert max_concurrency >= 1, f"max_concurrency must be at least 1 but got {max_concurrency}"
+    items = [BatchItem(index=i, prompt=prompt) for i, prompt in enumerate(prompts)]
+    lock = threading.Lock()
+    n_completed = 0
+
+    def _run(item: BatchItem):
+        nonlocal n_completed
+        t_start = time.perf_counter()
+        try:
+            item.output = fn(item.prompt)
+        except Exception as e:
+            item.error = e
+        item.latency_seconds = time.perf_counter() - t_start
+        with lock:
+            n_completed += 1
+            if progress_callback:
+                progress_callback(n_completed, len(items), item)
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="batch") as pool:
+        list(pool.map(_run, items))
+    return BatchResult(items=items, wall_time_seconds=time.perf_counter() - t_start)
+
+
+async def arun_batch(fn: Callable[[str], Awaitable[Any]], prompts: list[str], *, max_concurrency: int = 4, progress_callback: ProgressCallback = None) -> BatchResult:
+    """ Async counterpart of `run_batch`, at most `max_concurrency` coroutines are in flight """
+    assert max_concurrency >= 1, f"max_concurrency must be at least 1 but got {max_concurrency}"
+    items = [BatchItem(index=i, prompt=prompt) for i, prompt in enumerate(prompts)]
+    semaphore = asyncio.Semaphore(max_concurrency)
+    n_completed = 0
+
+    async def _run(item: BatchItem):
+        nonlocal n_completed
+        async with semaphore:
+            t_start = time.perf_counter()
+            try:
+                item.output = await fn(item.prompt)
+            except Exception as e:
+                item.error = e
+            item.latency_seconds = time.perf_counter() - t_start
+        n_completed += 1
+        if progress_callback:
+            progress_callback(n_completed, len(items), item)
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*[_run(item) for item in items])
+    return BatchResult(items=items, wall_time_seconds=time.perf_counter() - t_start)
@@ -0,0 +1,38 @@
+import time
+from dataclasses import dataclass, field
+
+
+class BudgetExceededError(RuntimeError):
+    pass
+
+
+@dataclass
+class Budget():
+    """
+    Limits of a single agent request. Checked before every model call, so a running model call or
+    tool call is never interrupted, but no new one is started once a limit is reached.
+
+    Args:
+        max_steps: Maximum tool calling steps, overrides the agent's `n_max_steps`.
+        max_tokens: Maximum prompt plus completion tokens over all model calls of the request.
+        max_seconds: Maximum wall time of the request.
+    """
+    max_steps: int | None = None
+    max_tokens: int | None = None
+    max_seconds: float | None = None
+
+    def check(self, request_stats: dict, t_start: float):
+        if self.max_tokens is not None and request_stats.get("prompt_tokens", 0) + request_stats.get("completion_tokens", 0) >= self.max_tokens:
+            raise BudgetExceededError(f"Token budget of {self.max_tokens} tokens exhausted")
+        if self.max_seconds is not None and time.perf_counter() - t_start >= self.max_seconds:
+            raise BudgetExceededError(f"Time budget of {self.max_seconds} seconds exhausted")
+
+
+@dataclass
+class SubAgentResult():
+    """ Tool output of a delegated sub-agent request, its usage is added to the calling agent's request stats """
+    output: str
+    usage: dict[str, float] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        return self.output
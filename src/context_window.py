@@ -0,0 +1,108 @@
+import json
+from ollama import Message
+from default_prompts import SUMMARY_PROMPT
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+IMAGE_TOKENS = 768
+
+
+def _field(message: dict | Message, key: str):
+    return message.get(key) if isinstance(message, dict) else getattr(message, key, None)
+
+
+def estimate_tokens(message: dict | Message) -> int:
+    """ Rough token count of a message (about four characters per token) """
+    n_chars = len(_field(message, "content") or "") + len(_field(message, "thinking") or "")
+    for tool_call in _field(message, "tool_calls") or []:
+        n_chars += len(tool_call.function.name) + len(json.dumps(dict(tool_call.function.arguments), default=str))
+    n_images = len(_field(message, "images") or [])
+    return MESSAGE_OVERHEAD_TOKENS + (n_chars // CHARS_PER_TOKEN) + n_images * IMAGE_TOKENS
+
+
+class ContextWindow():
+    """
+    Keeps an agent's message history within a token budget below the model context length.
+
+    Token counts are estimated once per message and cached. When the history exceeds the budget,
+    old tool outputs are truncated first, then the oldest turns are summarized with `summarizer`
+    (or dropped when no summarizer is given). Leading system messages and the latest user turn
+    are always kept intact.
+
+    Args:
+        max_tokens: Token budget for the history. Defaults to `num_ctx - reserve_tokens`.
+        reserve_tokens: Tokens left free for the model response when `max_tokens` is not set.
+        tool_output_chars: Characters kept from each old tool output when truncating.
+        summarizer: Optional `LLM` used to summarize dropped turns.
+    """
+
+    def __init__(self, max_tokens: int = None, *, reserve_tokens: int = 1024, tool_output_chars: int = 200, summarizer=None):
+        self.max_tokens = max_tokens
+        self.reserve_tokens = reserve_tokens
+        self.tool_output_chars = tool_output_chars
+        self.summarizer = summarizer
+        self._token_counts: dict[int, tuple[dict | Message, int]] = {}
+
+    def budget(self, num_ctx: int) -> int:
+        if self.max_tokens is not None:
+            return self.max_tokens
+        return max(num_ctx - self.reserve_tokens, num_ctx // 2)
+
+    def tokens(self, message: dict | Message) -> int:
+        """ Cached token estimate, keyed on message identity """
+        entry = self._token_counts.get(id(message))
+        if (entry is None) or (entry[0] is not message):
+            entry = (message, estimate_tokens(message))
+            self._token_counts[id(message)] = entry
+        return entry[1]
+
+    def count(self, messages: list) -> int:
+        return sum(self.tokens(message) for message in messages)
+
+    def fit(self, messages: list, num_ctx: int) -> list:
+        """ Return `messages` unchanged when within budget, otherwise a trimmed copy """
+        budget = self.budget(num_ctx)
+        if self.count(messages) <= budget:
+            return messages
+
+        # Pinned head (system prompt) and tail (latest user turn)
+        n_head = 0
+        while (n_head < len(messages)) and (_field(messages[n_head], "role") == "system"):
+            n_head += 1
+        last_user = max((i for i, message in enumerate(messages) if _field(message, "role") == "user"), default=len(messages))
+        last_user = max(last_user, n_head)
+        head, middle, tail = messages[:n_head], list(messages[n_head:last_user]), messages[last_user:]
+
+        # 1. Truncate old tool outputs, oldest first
+        for i, message in enumerate(middle):
+            if self.count(head) + self.count(middle) + self.count(tail) <= budget:
+                break
+            content = _field(message, "content") or ""
+            if (_field(message, "role") == "tool") and (len(content) > self.tool_output_chars):
+                truncated = content[:self.tool_output_chars] + " ...[truncated]"
+                middle[i] = {**message, "content": truncated} if isinstance(message, dict) else message.model_copy(update={"content": truncated})
+
+        # 2. Summarize or drop the oldest turns
+        dropped = []
+        while middle and (self.count(head) + self.count(middle) + self.count(tail) > budget):
+            turn_end = 1
+            while (turn_end < len(middle)) and (_field(middle[turn_end], "role") != "user"):
+                turn_end += 1
+            dropped += middle[:turn_end]
+            middle = middle[turn_end:]
+        if dropped and self.summarizer:
+            middle = [self.summarize(dropped)] + middle
+
+        # Prune cache entries of messages that are gone
+        trimmed = head + middle + tail
+        alive = {id(message) for message in trimmed}
+        self._token_counts = {key: entry for key, entry in self._token_counts.items() if key in alive}
+        return trimmed
+
+    def summarize(self, messages: list) -> dict:
+        transcript = "\n".join(f"{_field(message, 'role')}: {_field(message, 'content') or ''}" for message in messages)
+        response = self.summarizer.generate([
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ])
+        return {"role": "user", "content": f"Summary of the earlier conversation:\n{response.message.content}"}
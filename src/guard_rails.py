@@ -0,0 +1,314 @@
+import re
+import json
+import asyncio
+import time
+import threading
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Literal
+from pydantic import BaseModel, ValidationError
+from llm import LLM, AsyncLLM
+from default_prompts import GUARD_RAIL_PROMPT
+from tool_schemas import FrozenTool, required_arguments
+
+Stage = Literal["input", "tool_call", "output"]
+STAGES = ("input", "tool_call", "output")
+TIERS = ("prefilter", "schema", "classifier")
+
+
+@dataclass
+class Verdict():
+    """ Outcome of a check: allowed (True), blocked (False) or inconclusive (None) """
+    allowed: bool | None
+    tier: str = ""
+    reason: str = ""
+
+
+class GuardRailError(RuntimeError):
+    def __init__(self, verdict: Verdict):
+        super().__init__(f"Blocked by the {verdict.tier} guard rail: {verdict.reason}")
+        self.verdict = verdict
+
+
+class PatternFilter():
+    """
+    Cheapest tier: a size limit and precompiled regexes. Text matching `block` (or containing one of
+    the `keywords`) is blocked, text matching `escalate` is inconclusive and goes to the classifier,
+    everything else is allowed.
+
+    Args:
+        block: Regexes of content that is always blocked.
+        escalate: Regexes of suspicious content that needs a classifier decision.
+        keywords: Words that are always blocked, matched case-insensitively on word boundaries.
+        max_chars: Maximum length of the checked text.
+        stages: Stages the filter applies to.
+    """
+    tier = "prefilter"
+
+    def __init__(
+        self,
+        *,
+        block: list[str] = (),
+        escalate: list[str] = (),
+        keywords: list[str] = (),
+        max_chars: int = None,
+        stages: tuple[Stage, ...] = STAGES,
+        ):
+
+        assert set(stages) <= set(STAGES), f"Unknown stages {set(stages) - set(STAGES)}"
+        self.block = self._compile([*block, *(rf"\b{re.escape(keyword)}\b" for keyword in keywords)])
+        self.escalate = self._compile(escalate)
+        self.max_chars = max_chars
+        self.stages = stages
+
+    @staticmethod
+    def _compile(patterns: list[str]) -> re.Pattern | None:
+        """ One alternation per list, so the text is scanned once however many patterns there are """
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE) if patterns else None
+
+    def check(self, stage: Stage, text: str, **kwargs) -> Verdict:
+        if stage not in self.stages:
+            return Verdict(True, self.tier)
+        if self.max_chars is not None and len(text) > self.max_chars:
+            return Verdict(False, self.tier, f"{stage} is longer than {self.max_chars} characters")
+        if self.block and (match := self.block.search(text)):
+            return Verdict(False, self.tier, f"{stage} contains '{match.group(0)}'")
+        if self.escalate and (match := self.escalate.search(text)):
+            return Verdict(None, self.tier, f"{stage} contains '{match.group(0)}'")
+        return Verdict(True, self.tier)
+
+
+class ToolCallCheck():
+    """
+    Schema tier for tool calls: the called tool must be permitted, required arguments present,
+    no arguments unknown to the tool schema, argument values within the size limit, and every
+    custom rule of the tool must pass.
+
+    Args:
+        allowed_tools: Names of the only tools that may be called, None for all bound tools.
+        denied_tools: Names of tools that may never be called.
+        max_argument_chars: Maximum length of a serialized argument value.
+        rules: Per tool name, functions of the arguments returning a reason to block the call or None.
+    """
+    tier = "schema"
+
+    def __init__(
+        self,
+        *,
+        allowed_tools: list[str] = None,
+        denied_tools: list[str] = (),
+        max_argument_chars: int = None,
+        rules: dict[str, list[Callable[[dict], str | None]]] = None,
+        ):
+
+        self.allowed_tools = set(allowed_tools) if allowed_tools is not None else None
+        self.denied_tools = set(denied_tools)
+        self.max_argument_chars = max_argument_chars
+        self.rules = rules or {}
+
+    def check(self, stage: Stage, text: str, *, tool_name: str = None, arguments: dict = None, schema: FrozenTool = None, tool: Callable = None, **kwargs) -> Verdict:
+        if stage != "tool_call":
+            return Verdict(True, self.tier)
+        if tool_name in self.denied_tools or (self.allowed_tools is not None and tool_name not in self.allowed_tools):
+            return Verdict(False, self.tier, f"tool {tool_name} is not permitted")
+        arguments = arguments or {}
+        if schema is not None and schema.function.parameters is not None:
+            parameters = schema.function.parameters
+            # Parameters with defaults are optional, although the schema may list them as required
+            required = required_arguments(tool) if tool is not None else None
+            required = sorted(required) if required is not None else parameters.required or []
+            if missing := [name for name in required if name not in arguments]:
+                return Verdict(False, self.tier, f"missing required arguments {missing}")
+            if unknown := [name for name in arguments if name not in (parameters.properties or {})]:
+                return Verdict(False, self.tier, f"unknown arguments {unknown}")
+        if self.max_argument_chars is not None:
+            for name, value in arguments.items():
+                if len(value if isinstance(value, str) else json.dumps(value, default=str)) > self.max_argument_chars:
+                    return Verdict(False, self.tier, f"argument {name} is longer than {self.max_argument_chars} characters")
+        for rule in self.rules.get(tool_name, []):
+            if reason := rule(arguments):
+                return Verdict(False, self.tier, reason)
+        return Verdict(True, self.tier)
+
+
+class GuardRailDecision(BaseModel):
+    safe: bool
+    reason: str = ""
+
+
+class LLMClassifier():
+    """
+    Most expensive tier: a small local model decides on content the cheap tiers found inconclusive.
+
+    Args:
+        llm: Sync `LLM` of the classifier model, e.g. a 1B model with temperature 0 and a response cache.
+        prompt: System prompt of the classifier.
+        max_chars: Only the first `max_chars` characters of the text are classified.
+    """
+    tier = "classifier"
+
+    def __init__(self, llm: LLM, *, prompt: str = GUARD_RAIL_PROMPT, max_chars: int = 4000):
+        assert not isinstance(llm, AsyncLLM), "The classifier runs on worker threads and needs a sync LLM"
+        self.llm = llm
+        self.prompt = prompt
+        self.max_chars = max_chars
+
+    def check(self, stage: Stage, text: str, **kwargs) -> Verdict:
+        response = self.llm.generate(
+            [{"role": "system", "content": self.prompt}, {"role": "user", "content": f"Stage: {stage}\n\n{text[:self.max_chars]}"}],
+            structured_output=GuardRailDecision,
+        )
+        try:
+            decision = GuardRailDecision.model_validate_json(response.message.content)
+        except ValidationError:
+            return Verdict(None, self.tier, "unparseable classifier answer")
+        return Verdict(decision.safe, self.tier, decision.reason)
+
+
+class GuardRails():
+    """
+    Tiered guard rails for agent inputs, tool calls and outputs, attached with `Agent(..., guard_rails=...)`.
+
+    Tiers run from cheap to expensive and the first one that blocks decides: pattern prefilters
+    (microseconds), then tool call schema checks, and only when a cheap tier finds the content
+    inconclusive the classifier model. Escalated input checks run in the background while the
+    agent's first model call is generating, so they only add latency when the classifier is slower
+    than the model. Per-tier hit rates and the latency the agents actually waited for are in `stats()`.
+
+    Args:
+        prefilters: `PatternFilter`s, applied to all stages.
+        tool_checks: `ToolCallCheck`s, applied to tool calls.
+        classifier: `LLMClassifier` deciding inconclusive content.
+        on_inconclusive: Decision for inconclusive content without (or undecided by) a classifier.
+        max_workers: Threads running escalated checks in the background.
+    """
+
+    def __init__(
+        self,
+        prefilters: list[PatternFilter] = (),
+        tool_checks: list[ToolCallCheck] = (),
+        classifier: LLMClassifier = None,
+        *,
+        on_inconclusive: Literal["allow", "block"] = "allow",
+        max_workers: int = 4,
+        ):
+
+        assert on_inconclusive in ("allow", "block"), f"Unknown on_inconclusive {on_inconclusive}"
+        self.prefilters = list(prefilters)
+        self.tool_checks = list(tool_checks)
+        self.classifier = classifier
+        self.on_inconclusive = on_inconclusive
+        self.max_workers = max_workers
+        self._pool: ThreadPoolExecutor = None
+        self._lock = threading.Lock()
+        self._tier_stats = {tier: {"checks": 0, "blocks": 0, "inconclusive": 0, "seconds": 0.0} for tier in TIERS}
+        self._latency = {"checks": 0, "seconds": 0.0}
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="guard-rail")
+        return self._pool
+
+    def applies_to(self, stage: Stage) -> bool:
+        """ Whether any tier checks `stage`, the classifier only decides what the cheap tiers escalate """
+        return any(stage in prefilter.stages for prefilter in self.prefilters) or (stage == "tool_call" and bool(self.tool_checks))
+
+    def _run(self, guard: Any, stage: Stage, text: str, **kwargs) -> Verdict:
+        t_start = time.perf_counter()
+        verdict = guard.check(stage, text, **kwargs)
+        with self._lock:
+            stats = self._tier_stats[guard.tier]
+            stats["checks"] += 1
+            stats["blocks"] += verdict.allowed is False
+            stats["inconclusive"] += verdict.allowed is None
+            stats["seconds"] += time.perf_counter() - t_start
+        return verdict
+
+    def _cheap(self, stage: Stage, text: str, **kwargs) -> Verdict:
+        """ Prefilter and schema tiers, returns the first block, else the first inconclusive verdict """
+        inconclusive = None
+        for guard in [*self.prefilters, *(self.tool_checks if stage == "tool_call" else ())]:
+            verdict = self._run(guard, stage, text, **kwargs)
+            if verdict.allowed is False:
+                return verdict
+            if verdict.allowed is None and inconclusive is None:
+                inconclusive = verdict
+        return inconclusive or Verdict(True)
+
+    def _escalate(self, stage: Stage, text: str, inconclusive: Verdict) -> Verdict:
+        if self.classifier is not None:
+            verdict = self._run(self.classifier, stage, text)
+            if verdict.allowed is not None:
+                return verdict
+        return Verdict(self.on_inconclusive == "allow", inconclusive.tier, f"inconclusive, {inconclusive.reason}")
+
+    def _record_latency(self, t_start: float):
+        with self._lock:
+            self._latency["checks"] += 1
+            self._latency["seconds"] += time.perf_counter() - t_start
+
+    def check(self, stage: Stage, text: str, **kwargs) -> Verdict:
+        """ Run all tiers needed to decide on `text`, blocking until the decision is made """
+        t_start = time.perf_counter()
+        verdict = self._cheap(stage, text, **kwargs)
+        if verdict.allowed is None:
+            verdict = self._escalate(stage, text, verdict)
+        self._record_latency(t_start)
+        return verdict
+
+    def start(self, stage: Stage, text: str, **kwargs) -> Verdict | Future:
+        """
+        Run the cheap tiers now and return their verdict if they decide, else a future of the
+        classifier escalation running in the background, see `resolve`
+        """
+        t_start = time.perf_counter()
+        verdict = self._cheap(stage, text, **kwargs)
+        if verdict.allowed is not None:
+            self._record_latency(t_start)
+            return verdict
+        with self._lock:
+            self._latency["seconds"] += time.perf_counter() - t_start
+        return self.pool.submit(self._escalate, stage, text, verdict)
+
+    def resolve(self, pending: Verdict | Future) -> Verdict:
+        """ Decision of a check begun with `start`, only the time spent waiting here counts as added latency """
+        if not isinstance(pending, Future):
+            return pending
+        t_start = time.perf_counter()
+        verdict = pending.result()
+        self._record_latency(t_start)
+        return verdict
+
+    async def aresolve(self, pending: Verdict | Future) -> Verdict:
+        """ `resolve` without blocking the event loop """
+        if not isinstance(pending, Future):
+            return pending
+        t_start = time.perf_counter()
+        verdict = await asyncio.wrap_future(pending)
+        self._record_latency(t_start)
+        return verdict
+
+    def stats(self) -> dict:
+        with self._lock:
+            tiers = {
+                tier: {
+                    **stats,
+                    "block_rate": stats["blocks"] / stats["checks"] if stats["checks"] else 0.0,
+                    "inconclusive_rate": stats["inconclusive"] / stats["checks"] if stats["checks"] else 0.0,
+                    "mean_ms": 1000 * stats["seconds"] / stats["checks"] if stats["checks"] else 0.0,
+                }
+                for tier, stats in self._tier_stats.items()
+            }
+            return {
+                "tiers": tiers,
+                "checks": self._latency["checks"],
+                "added_latency_seconds": self._latency["seconds"],
+                "mean_added_latency_ms": 1000 * self._latency["seconds"] / self._latency["checks"] if self._latency["checks"] else 0.0,
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,317 @@
+import time
+import httpx
+import ollama
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Iterator, AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from ollama import ListResponse
+
+
+class NoHealthyHostError(ConnectionError):
+    pass
+
+
+@dataclass(eq=False)
+class _Host():
+    url: str
+    client: ollama.Client
+    outstanding: int = 0
+    failures: int = 0
+    healthy: bool = True
+    retry_at: float = 0.0
+    models: set[str] | None = None
+
+
+def _is_host_failure(error: Exception) -> bool:
+    """ Errors caused by the host rather than by the request, safe to retry on another host """
+    if isinstance(error, (ConnectionError, httpx.TransportError)):
+        return True
+    return isinstance(error, ollama.ResponseError) and error.status_code >= 500
+
+
+class HostPool():
+    """
+    Pool of Ollama servers used as one client by `LLM`, e.g. `LLM("qwen3:4b", host=HostPool([...]))`.
+
+    Every host gets its own client with a bounded HTTP connection pool. Requests are routed to
+    the healthy host with the fewest outstanding requests ("least_outstanding"), or always to the
+    same host per model ("affinity", rendezvous hashing) so a model stays loaded and its prompt
+    cache stays warm on one server. Hosts that do not list the requested model are skipped.
+
+    A host is taken out of rotation after `max_failures` consecutive connection errors or 5xx
+    responses and is tried again after `health_check_interval` seconds. Failed requests are retried
+    on another host; all calls exposed here are read-only on the server, so retrying is safe.
+    Streamed responses are only retried until their first chunk arrived.
+
+    Args:
+        hosts: Ollama host URLs.
+        strategy: "least_outstanding" or "affinity".
+        max_connections: HTTP connections kept per host.
+        timeout: HTTP timeout in seconds per request, None to wait indefinitely.
+        max_failures: Consecutive failures after which a host is marked unhealthy.
+        health_check_interval: Seconds before an unhealthy host is tried again.
+        retries: Additional hosts tried when a request fails.
+    """
+
+    def __init__(
+        self,
+        hosts: list[str],
+        *,
+        strategy: str = "least_outstanding",
+        max_connections: int = 10,
+        timeout: float = None,
+        max_failures: int = 3,
+        health_check_interval: float = 30.0,
+        retries: int = 2,
+        ):
+
+        assert hosts, "HostPool needs at least one host"
+        assert strategy in ("least_outstanding", "affinity"), f"Unknown routing strategy {strategy}"
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.health_check_interval = health_check_interval
+        self.retries = retries
+        self._client_kwargs = dict(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.hosts = [_Host(url, ollama.Client(url, **self._client_kwargs)) for url in dict.fromkeys(hosts)]
+        self._lock = threading.Lock()
+        self._models_checked = False
+
+    def __repr__(self) -> str:
+        return f"HostPool({[host.url for host in self.hosts]}, strategy={self.strategy!r})"
+
+    # Health
+
+    def check_health(self) -> dict[str, bool]:
+        """ Probe all hosts concurrently and refresh the models each host serves """
+        def probe(host: _Host):
+            try:
+                models = {x.model for x in host.client.list().models}
+            except Exception as e:
+                if not _is_host_failure(e):
+                    raise
+                self._record(host, ok=False, force=True)
+            else:
+                with self._lock:
+                    host.models = models
+                self._record(host, ok=True)
+
+        with ThreadPoolExecutor(max_workers=len(self.hosts)) as pool:
+            list(pool.map(probe, self.hosts))
+        self._models_checked = True
+        return {host.url: host.healthy for host in self.hosts}
+
+    def _record(self, host: _Host, ok: bool, force: bool = False):
+        with self._lock:
+            if ok:
+                host.failures = 0
+                host.healthy = True
+                return
+            host.failures += 1
+            if force or host.failures >= self.max_failures:
+                host.healthy = False
+                host.retry_at = time.monotonic() + self.health_check_interval
+
+    def _serves(self, host: _Host, model: str) -> bool:
+        if (model is None) or (host.models is None):
+            return True
+        return any(name == model or name.startswith(f"{model}:") for name in host.models)
+
+    # Routing
+
+    def _acquire(self, model: str = None, exclude: set = ()) -> _Host:
+        """ Pick a host for the next request and count it as outstanding """
+        if not self._models_checked:
+            self.check_health()
+        now = time.monotonic()
+        with self._lock:
+            candidates = [host for host in self.hosts if host not in exclude and (host.healthy or now >= host.retry_at)]
+            serving = [host for host in candidates if self._serves(host, model)]
+            candidates = serving or candidates
+            if not candidates:
+                raise NoHealthyHostError(f"No healthy Ollama host available in {self}")
+            if self.strategy == "affinity" and model is not None:
+                host = max(candidates, key=lambda host: hashlib.sha256(f"{host.url}|{model}".encode("utf-8")).digest())
+            else:
+                host = min(candidates, key=lambda host: (host.outstanding, host.failures))
+            host.outstanding += 1
+            return host
+
+    def _release(self, host: _Host):
+        with self._lock:
+            host.outstanding -= 1
+
+    def _call(self, method: str, route_model: str = None, **kwargs) -> Any:
+        """ Run `client.<method>(**kwargs)` on a routed host, retrying host failures elsewhere """
+        tried = set()
+        while True:
+            host = self._acquire(route_model, tried)
+            try:
+                response = getattr(host.client, method)(**kwargs)
+            except Exception as e:
+                if not _is_host_failure(e):
+                    raise
+                self._record(host, ok=False)
+                tried.add(host)
+                if len(tried) > self.retries:
+                    raise
+                continue
+            finally:
+                self._release(host)
+            self._record(host, ok=True)
+            return response
+
+    def _stream(self, method: str, route_model: str = None, **kwargs) -> Iterator:
+        """ Streaming variant of `_call`, the host stays outstanding until the stream is consumed """
+        tried = set()
+        while True:
+            host = self._acquire(route_model, tried)
+            try:
+                chunks = getattr(host.client, method)(**kwargs)
+                first = next(chunks)
+            except StopIteration:
+                self._release(host)
+                return
+            except Exception as e:
+                self._release(host)
+                if not _is_host_failure(e):
+                    raise
+                self._record(host, ok=False)
+                tried.add(host)
+                if len(tried) > self.retries:
+                    raise
+                continue
+            break
+
+        try:
+            yield first
+            yield from chunks
+            self._record(host, ok=True)
+        finally:
+            self._release(host)
+
+    # ollama.Client interface
+
+    def chat(self, model: str = "", messages=None, *, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream("chat", model, model=model, messages=messages, stream=True, **kwargs)
+        return self._call("chat", model, model=model, messages=messages, **kwargs)
+
+    def generate(self, model: str = "", prompt: str = "", *, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream("generate", model, model=model, prompt=prompt, stream=True, **kwargs)
+        return self._call("generate", model, model=model, prompt=prompt, **kwargs)
+
+    def embed(self, model: str = "", input="", **kwargs):
+        return self._call("embed", model, model=model, input=input, **kwargs)
+
+    def show(self, model: str):
+        return self._call("show", model, model=model)
+
+    def list(self) -> ListResponse:
+        """ Models available on any healthy host """
+        self.check_health()
+        models = {}
+        for host in self.hosts:
+            if host.healthy and host.models:
+                models.update({name: None for name in host.models})
+        if not any(host.healthy for host in self.hosts):
+            raise NoHealthyHostError(f"No healthy Ollama host available in {self}")
+        return ListResponse(models=[ListResponse.Model(model=name) for name in sorted(models)])
+
+    def ps(self):
+        return self._call("ps")
+
+    def async_client(self) -> "AsyncHostPool":
+        """ Async view on the pool, sharing its routing and health state """
+        return AsyncHostPool(self)
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            return {host.url: {"healthy": host.healthy, "outstanding": host.outstanding, "failures": host.failures} for host in self.hosts}
+
+
+class AsyncHostPool():
+    """
+    Async counterpart of `HostPool` used by `AsyncLLM`. Routing and health state are shared with
+    the parent pool, each view owns its `ollama.AsyncClient` per host since async clients are bound
+    to the event loop they are first used on.
+    """
+
+    def __init__(self, pool: HostPool):
+        self.pool = pool
+        self._clients = {host.url: ollama.AsyncClient(host.url, **pool._client_kwargs) for host in pool.hosts}
+
+    async def _call(self, method: str, route_model: str = None, **kwargs) -> Any:
+        tried = set()
+        while True:
+            host = self.pool._acquire(route_model, tried)
+            try:
+                response = await getattr(self._clients[host.url], method)(**kwargs)
+            except Exception as e:
+                if not _is_host_failure(e):
+                    raise
+                self.pool._record(host, ok=False)
+                tried.add(host)
+                if len(tried) > self.pool.retries:
+                    raise
+                continue
+            finally:
+                self.pool._release(host)
+            self.pool._record(host, ok=True)
+            return response
+
+    async def _stream(self, method: str, route_model: str = None, **kwargs) -> AsyncIterator:
+        tried = set()
+        while True:
+            host = self.pool._acquire(route_model, tried)
+            try:
+                chunks = await getattr(self._clients[host.url], method)(**kwargs)
+                first = await anext(chunks)
+            except StopAsyncIteration:
+                self.pool._release(host)
+                return
+            except Exception as e:
+                self.pool._release(host)
+                if not _is_host_failure(e):
+                    raise
+                self.pool._record(host, ok=False)
+                tried.add(host)
+                if len(tried) > self.pool.retries:
+                    raise
+                continue
+            break
+
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+            self.pool._record(host, ok=True)
+        finally:
+            self.pool._release(host)
+
+    async def chat(self, model: str = "", messages=None, *, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream("chat", model, model=model, messages=messages, stream=True, **kwargs)
+        return await self._call("chat", model, model=model, messages=messages, **kwargs)
+
+    async def generate(self, model: str = "", prompt: str = "", *, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream("generate", model, model=model, prompt=prompt, stream=True, **kwargs)
+        return await self._call("generate", model, model=model, prompt=prompt, **kwargs)
+
+    async def embed(self, model: str = "", input="", **kwargs):
+        return await self._call("embed", model, model=model, input=input, **kwargs)
+
+    async def show(self, model: str):
+        return await self._call("show", model, model=model)
+
+    async def list(self) -> ListResponse:
+        return self.pool.list()
+
+    async def ps(self):
+        return await self._call("ps")
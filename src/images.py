@@ -0,0 +1,98 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image as PILImage
+except ImportError:  # Pillow is optional, images are then sent as they are stored
+    PILImage = None
+
+# Longest image side sent to the model, vision encoders downscale larger images anyway
+DEFAULT_MAX_SIDE = 1024
+
+
+class ImageCache():
+    """ LRU cache of prepared image payloads keyed by path, modification time and encoding settings """
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            if (payload := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, payload: bytes):
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+IMAGE_CACHE = ImageCache()
+
+
+def _resize(data: bytes, max_side: int, image_format: str, quality: int) -> bytes:
+    """ Downscale to `max_side` and re-encode, the original bytes are kept when that does not make them smaller """
+    with PILImage.open(io.BytesIO(data)) as image:
+        if max(image.size) <= max_side and image.format == image_format:
+            return data
+        image.thumbnail((max_side, max_side), PILImage.Resampling.LANCZOS)
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=quality, optimize=True)
+    payload = buffer.getvalue()
+    return payload if len(payload) < len(data) else data
+
+
+def load_image(
+    image_path: str | os.PathLike,
+    *,
+    max_side: int | None = DEFAULT_MAX_SIDE,
+    image_format: str = "JPEG",
+    quality: int = 85,
+    cache: ImageCache | None = IMAGE_CACHE,
+    ) -> bytes:
+    """
+    Read an image file as bytes, downscaled so that its longest side is at most `max_side` pixels
+    and re-encoded as `image_format` (requires Pillow, otherwise the file is returned unchanged).
+    Payloads are cached by path and modification time, so repeated calls skip reading and encoding.
+    """
+    image_path = os.path.abspath(image_path)
+    stat = os.stat(image_path)
+    key = (image_path, stat.st_mtime_ns, stat.st_size, max_side, image_format, quality)
+    if cache is not None and (payload := cache.get(key)) is not None:
+        return payload
+
+    with open(image_path, "rb") as f:
+        payload = f.read()
+    if max_side and PILImage is not None:
+        payload = _resize(payload, max_side, image_format, quality)
+
+    if cache is not None:
+        cache.put(key, payload)
+    return payload
+
+
+def load_images(image_paths: list[str | os.PathLike], **kwargs) -> list[bytes]:
+    """ `load_image` for several files, decoded and resized in parallel threads (Pillow releases the GIL) """
+    if len(image_paths) <= 1:
+        return [load_image(image_path, **kwargs) for image_path in image_paths]
+    with ThreadPoolExecutor(max_workers=min(8, len(image_paths))) as pool:
+        return list(pool.map(lambda image_path: load_image(image_path, **kwargs), image_paths))
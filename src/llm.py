@@ -1,7 +1,15 @@
+import time
+import asyncio
 import ollama
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, AsyncIterator
 from pydantic import BaseModel
 from ollama import Options, ChatResponse
 from default_prompts import ASSISTANT_PROMPT
+from model_registry import ModelRegistry, MODEL_REGISTRY
+from host_pool import HostPool
+from response_cache import ResponseCache, make_cache_key
 
 class LLM():
 
@@ -16,25 +24,31 @@ class LLM():
         top_p: float = 0.9,
         top_k: int = 40,
         max_tokens: int = -1,
+        host: str | list[str] | HostPool = None,
+        lazy: bool = False,
+        registry: ModelRegistry = None,
+        cache: ResponseCache = None,
+        keep_alive: float | str = None,
         ):
 
-        # Check model availability
-        available_model_names = [x.model for x in ollama.list().models]
-        if not any([(model.startswith(model_name)) for model in available_model_names]):
-            raise ValueError(f"Model {model_name} not found. Use 'ollama pull <model_name>' to pull specific model.\nAvailable local models:\n- {"\n- ".join(available_model_names)}")
-
-        # Ollama Client
+        # Ollama Client, several hosts are load balanced through a `HostPool`
         self.model_name = model_name
-        self.client = ollama.Client()
-        self.capabilities = ollama.show(model_name).capabilities
+        self.host = HostPool(host) if isinstance(host, (list, tuple)) else host
+        self.registry = registry or MODEL_REGISTRY
+        self._client = None
 
-        # Reasoning
-        if "thinking" in self.capabilities:
-            self.use_thinking = use_thinking
-        else:
-            if use_thinking:
-                print(f"Warning: Model {model_name} does not support reasoning. Setting use_thinking to False")
-            self.use_thinking = False
+        # Opt-in response cache, only consulted for deterministic sampling
+        self.cache = cache
+
+        # How long Ollama keeps the model in memory after a request (e.g. "30m", -1 for forever)
+        self.keep_alive = keep_alive
+
+        # Model availability and capabilities, resolved on first use in lazy mode
+        self._capabilities: list[str] = None
+        self._requested_thinking = use_thinking
+        self.use_thinking = False
+        if not lazy:
+            self._resolve_capabilities()
 
         # Model sampling parmeters
         if options:
@@ -48,18 +62,162 @@ class LLM():
                 num_predict=max_tokens
         )
 
+    def _resolve_capabilities(self):
+        """ Check model availability and capabilities through the shared model registry """
+
+        # Check model availability
+        if self.registry.resolve_model(self.model_name, self.host) is None:
+            available_model_names = sorted(self.registry.available_models(self.host))
+            raise ValueError(f"Model {self.model_name} not found. Use 'ollama pull <model_name>' to pull specific model.\nAvailable local models:\n- {"\n- ".join(available_model_names)}")
+        self._capabilities = self.registry.capabilities(self.model_name, self.host)
+
+        # Reasoning
+        if "thinking" in self._capabilities:
+            self.use_thinking = self._requested_thinking
+        else:
+            if self._requested_thinking:
+                print(f"Warning: Model {self.model_name} does not support reasoning. Setting use_thinking to False")
+            self.use_thinking = False
+
+    def _make_client(self) -> ollama.Client:
+        """ Sync clients are thread-safe, so one client per host is shared through the registry """
+        return self.registry.client(self.host)
+
+    @property
+    def client(self) -> ollama.Client:
+        if self._client is None:
+            self._client = self._make_client()
+        return self._client
+
+    @client.setter
+    def client(self, client: ollama.Client):
+        self._client = client
+
+    @property
+    def is_resolved(self) -> bool:
+        """ Model availability and capabilities were looked up, always after construction unless lazy """
+        return self._capabilities is not None
+
+    @property
+    def capabilities(self) -> list[str]:
+        """ Model capabilities, looked up in the registry so TTL invalidation is honoured """
+        if self._capabilities is None:
+            self._resolve_capabilities()
+            return self._capabilities
+        return self.registry.capabilities(self.model_name, self.host)
+
         
-    def generate(self, messages: list[dict[str, str]], tools: list = None, structured_output: BaseModel = None) -> ChatResponse:
-        """ Invoke the model """
-        return self.client.chat(
+    def _chat_kwargs(self, messages: list[dict[str, str]], tools: list = None, structured_output: BaseModel = None, stream: bool = False) -> dict:
+        """ Keyword arguments shared by the sync and async chat calls """
+        if self._capabilities is None:
+            self._resolve_capabilities()
+        return dict(
             model=self.model_name,
             messages=messages,
             tools=tools,
+            stream=stream,
             think=False if structured_output else self.use_thinking,
             format=structured_output.model_json_schema() if structured_output else None,
             options=self.options,
+            keep_alive=self.keep_alive,
         )
 
+    def warmup(self) -> float:
+        """ Load the model into memory ahead of the first request, returns the load time in seconds """
+        t_start = time.perf_counter()
+        self.client.generate(model=self.model_name, prompt="", keep_alive=self.keep_alive)
+        return time.perf_counter() - t_start
+
+    def unload(self):
+        """ Ask Ollama to release the model from memory right away """
+        self.client.generate(model=self.model_name, prompt="", keep_alive=0)
+
+    @property
+    def is_deterministic(self) -> bool:
+        """ Sampling is reproducible with zero temperature or a fixed seed """
+        return (self.options.get("temperature") == 0) or (self.options.get("seed") is not None)
+
+    def _cache_key(self, chat_kwargs: dict) -> str | None:
+        if (self.cache is None) or chat_kwargs["stream"] or not self.is_deterministic:
+            return None
+        return make_cache_key(chat_kwargs)
+
+    def generate(self, messages: list[dict[str, str]], tools: list = None, structured_output: BaseModel = None, stream: bool = False) -> ChatResponse | Iterator[ChatResponse]:
+        """ Invoke the model, with `stream=True` an iterator of partial responses is returned """
+        chat_kwargs = self._chat_kwargs(messages, tools, structured_output, stream)
+        if cache_key := self._cache_key(chat_kwargs):
+            if (response := self.cache.get(cache_key)) is not None:
+                return response
+        response = self.client.chat(**chat_kwargs)
+        if cache_key:
+            self.cache.put(cache_key, response)
+        return response
+
+
+class AsyncLLM(LLM):
+    """
+    LLM backed by `ollama.AsyncClient`, many agents can share one instance on a single event loop.
+    The instance can be used from several event loops (e.g. consecutive `asyncio.run` calls or
+    threads running their own loop), each loop gets its own client.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._loop_clients: dict[asyncio.AbstractEventLoop, ollama.AsyncClient] = {}
+        self._loop_clients_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _make_client(self) -> ollama.AsyncClient:
+        if isinstance(self.host, HostPool):
+            return self.host.async_client()
+        return ollama.AsyncClient(self.host)
+
+    @property
+    def client(self) -> ollama.AsyncClient:
+        """ Client of the running event loop, async clients cannot be used on any other loop """
+        if self._client is not None:
+            return self._client
+        loop = asyncio.get_running_loop()
+        with self._loop_clients_lock:
+            client = self._loop_clients.get(loop)
+            if client is None:
+                # Clients of closed loops can never be used again
+                for closed in [closed for closed in self._loop_clients if closed.is_closed()]:
+                    del self._loop_clients[closed]
+                client = self._loop_clients[loop] = self._make_client()
+            return client
+
+    @client.setter
+    def client(self, client: ollama.AsyncClient):
+        """ Explicitly set clients are used on every loop """
+        self._client = client
+
+    async def warmup(self) -> float:
+        t_start = time.perf_counter()
+        await self.client.generate(model=self.model_name, prompt="", keep_alive=self.keep_alive)
+        return time.perf_counter() - t_start
+
+    async def unload(self):
+        await self.client.generate(model=self.model_name, prompt="", keep_alive=0)
+
+    async def generate(self, messages: list[dict[str, str]], tools: list = None, structured_output: BaseModel = None, stream: bool = False) -> ChatResponse | AsyncIterator[ChatResponse]:
+        """ Invoke the model without blocking the event loop """
+        chat_kwargs = self._chat_kwargs(messages, tools, structured_output, stream)
+        if cache_key := self._cache_key(chat_kwargs):
+            if (response := self.cache.get(cache_key)) is not None:
+                return response
+        response = await self.client.chat(**chat_kwargs)
+        if cache_key:
+            self.cache.put(cache_key, response)
+        return response
+
+
+def preload_models(model_names: list[str], *, keep_alive: float | str = "30m", host: str | HostPool = None) -> dict[str, LLM]:
+    """ Load several models concurrently and keep them resident, returns the warmed-up `LLM` per model name """
+    llms = {model_name: LLM(model_name, keep_alive=keep_alive, host=host) for model_name in model_names}
+    with ThreadPoolExecutor(max_workers=max(1, len(llms))) as pool:
+        list(pool.map(LLM.warmup, llms.values()))
+    return llms
+
 
 
 if __name__ == "__main__":
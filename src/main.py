@@ -1,6 +1,7 @@
 import random
 from llm import LLM
 from agents import Agent
+from tool_cache import pure
 from pydantic import BaseModel, Field
 
 def main():
@@ -11,7 +12,8 @@ def main():
         weather_condition: str = Field(description="Description of the weather")
         appropriate_clothing: str = Field(description="Appropriate clothing for the weather")
 
-    # Tools
+    # Tools, pure tools are memoized and can run before the model turn ends
+    @pure
     def celcius_to_fahrenheit(celcius: float) -> float:
         """Convert Celsius to Fahrenheit."""
         return (celcius * 9/5) + 32
@@ -43,6 +45,7 @@ def main():
         system_prompt="You are a helpful assistant.", # System prompt
         structured_output=Weather, # Structured output
         n_max_steps=5, # Limit the number of steps
+        speculative_tools=True, # Start pure tool calls while the model turn is still streaming
     )
 
     # Invoke the agent
@@ -0,0 +1,319 @@
+import os
+import json
+import atexit
+import itertools
+import threading
+import subprocess
+import httpx
+from concurrent.futures import Future
+from typing import Any, Callable
+from tool_schemas import FrozenTool
+
+MCP_PROTOCOL_VERSION = "2025-03-26"
+CLIENT_INFO = {"name": "ollama-agents", "version": "0.1.0"}
+
+
+class MCPError(RuntimeError):
+    pass
+
+
+class _StdioTransport():
+    """ Newline-delimited JSON-RPC over the stdin/stdout of a long-lived server process """
+
+    def __init__(self, command: list[str], on_message: Callable[[dict | None], None], *, env: dict[str, str] = None, cwd: str = None):
+        self.command = command
+        # Set before the reader starts, an early EOF already reports to it
+        self.on_message = on_message
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env={**os.environ, **(env or {})},
+            cwd=cwd,
+            bufsize=0,
+        )
+        self._write_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        for line in self.process.stdout:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # servers may log to stdout
+            if isinstance(message, dict):  # so may JSON values that are not messages, e.g. "starting" or null
+                self.on_message(message)
+        self.on_message(None)
+
+    def send(self, message: dict):
+        data = (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._write_lock:
+            try:
+                self.process.stdin.write(data)
+                self.process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                raise MCPError(f"MCP server {self.command} is not running: {e}") from e
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self):
+        if self.alive:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+class _HTTPTransport():
+    """ Streamable HTTP transport: JSON-RPC messages are POSTed on one keep-alive connection pool """
+
+    def __init__(self, url: str, on_message: Callable[[dict | None], None], *, headers: dict[str, str] = None, timeout: float = 60.0):
+        self.url = url
+        self.on_message = on_message
+        self.client = httpx.Client(headers={"Accept": "application/json, text/event-stream", **(headers or {})}, timeout=timeout)
+        self.session_id: str = None
+
+    def send(self, message: dict):
+        headers = {"Mcp-Session-Id": self.session_id} if self.session_id else {}
+        try:
+            response = self.client.post(self.url, json=message, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise MCPError(f"MCP request to {self.url} failed: {e}") from e
+        self.session_id = response.headers.get("Mcp-Session-Id", self.session_id)
+        if response.status_code == 202 or not response.content:
+            return
+        if response.headers.get("Content-Type", "").startswith("text/event-stream"):
+            for line in response.text.splitlines():
+                if line.startswith("data:") and line[5:].strip() and isinstance(item := json.loads(line[5:]), dict):
+                    self.on_message(item)
+        else:
+            body = response.json()
+            for item in body if isinstance(body, list) else [body]:
+                if isinstance(item, dict):
+                    self.on_message(item)
+
+    @property
+    def alive(self) -> bool:
+        return not self.client.is_closed
+
+    def close(self):
+        if self.session_id:
+            try:
+                self.client.delete(self.url, headers={"Mcp-Session-Id": self.session_id})
+            except httpx.HTTPError:
+                pass
+        self.client.close()
+
+
+class MCPTool():
+    """ Callable proxy of a tool on an MCP server, usable like any python tool in `Agent.bind_tools` """
+
+    def __init__(self, client: "MCPClient", spec: dict):
+        self._client = client
+        self.__name__ = spec["name"]
+        self.__doc__ = spec.get("description") or ""
+        self.tool_schema = FrozenTool.model_validate({
+            "type": "function",
+            "function": {
+                "name": spec["name"],
+                "description": spec.get("description") or "",
+                "parameters": spec.get("inputSchema") or {"type": "object", "properties": {}},
+            },
+        })
+
+    @property
+    def client(self) -> "MCPClient":
+        """ Client to call, tools of pooled clients look it up in the pool so a restarted server is used """
+        if self._client.pool_key is None:
+            return self._client
+        return _pooled_client(self._client.pool_key, self._client.pool_options)
+
+    def __call__(self, **arguments) -> str:
+        return self.client.call_tool(self.__name__, arguments)
+
+    def __repr__(self) -> str:
+        return f"MCPTool({self.__name__!r})"
+
+
+class MCPClient():
+    """
+    Client for one Model Context Protocol server, connected over stdio (`command`) or HTTP (`url`).
+
+    The server process or HTTP connection pool is started once and kept alive; requests from any
+    number of threads are multiplexed over it by JSON-RPC id. The tool list is cached until the
+    server sends a `notifications/tools/list_changed` notification.
+
+    Use `get_mcp_client` to share clients (and server processes) across agents and invocations.
+    """
+
+    def __init__(
+        self,
+        command: list[str] = None,
+        *,
+        url: str = None,
+        env: dict[str, str] = None,
+        cwd: str = None,
+        headers: dict[str, str] = None,
+        timeout: float = 60.0,
+        ):
+
+        assert (command is None) != (url is None), "Pass either a command (stdio server) or a url (HTTP server)"
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._pending: dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._tools: list[MCPTool] = None
+        # Set by `get_mcp_client` for clients of the process-wide pool
+        self.pool_key: tuple = None
+        self.pool_options: dict = {}
+
+        if command is not None:
+            self.transport = _StdioTransport(list(command), self._on_message, env=env, cwd=cwd)
+        else:
+            self.transport = _HTTPTransport(url, self._on_message, headers=headers, timeout=timeout)
+        self.server_info = self._initialize()
+
+    # JSON-RPC
+
+    def _on_message(self, message: dict | None):
+        if message is None:  # server exited, fail everything in flight
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(MCPError("MCP server closed the connection"))
+            return
+        if "id" in message and ("result" in message or "error" in message):
+            with self._lock:
+                future = self._pending.pop(message["id"], None)
+            if future is None:
+                return
+            if "error" in message:
+                future.set_exception(MCPError(f"{message['error'].get('message')} (code {message['error'].get('code')})"))
+            else:
+                future.set_result(message["result"])
+        elif message.get("method") == "notifications/tools/list_changed":
+            self._tools = None
+        elif "id" in message and "method" in message:
+            # Server-to-client requests (e.g. ping) are answered, sampling and roots are not supported
+            if message["method"] == "ping":
+                self.transport.send({"jsonrpc": "2.0", "id": message["id"], "result": {}})
+            else:
+                self.transport.send({"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32601, "message": "Method not supported"}})
+
+    def request(self, method: str, params: dict = None, *, timeout: float = None) -> Any:
+        request_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[request_id] = future
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        try:
+            self.transport.send(message)
+            return future.result(timeout=timeout or self.timeout)
+        except TimeoutError as e:
+            raise MCPError(f"MCP request {method} timed out") from e
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+    def notify(self, method: str, params: dict = None):
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        self.transport.send(message)
+
+    def _initialize(self) -> dict:
+        result = self.request("initialize", {
+            "protocolVersion": MCP_PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": CLIENT_INFO,
+        })
+        self.notify("notifications/initialized")
+        return result
+
+    # Tools
+
+    def list_tools(self, *, refresh: bool = False) -> list[MCPTool]:
+        """ Tools offered by the server, cached until the server reports a change """
+        if self._tools is None or refresh:
+            specs, cursor = [], None
+            while True:
+                result = self.request("tools/list", {"cursor": cursor} if cursor else {})
+                specs.extend(result.get("tools", []))
+                if not (cursor := result.get("nextCursor")):
+                    break
+            self._tools = [MCPTool(self, spec) for spec in specs]
+        return self._tools
+
+    def call_tool(self, name: str, arguments: dict = None) -> str:
+        """ Call a tool and return its text content, tool errors are returned as 'Error: ...' strings """
+        try:
+            result = self.request("tools/call", {"name": name, "arguments": arguments or {}})
+        except MCPError as e:
+            return f"Error: {e}"
+        parts = []
+        for item in result.get("content", []):
+            if item.get("type") == "text":
+                parts.append(item["text"])
+            elif item.get("type") == "resource" and "text" in item.get("resource", {}):
+                parts.append(item["resource"]["text"])
+            else:
+                parts.append(f"[{item.get('type')} content]")
+        if not parts and "structuredContent" in result:
+            parts.append(json.dumps(result["structuredContent"]))
+        text = "\n".join(parts)
+        return f"Error: {text}" if result.get("isError") else text
+
+    @property
+    def alive(self) -> bool:
+        return self.transport.alive
+
+    def close(self):
+        self.transport.close()
+
+
+_CLIENTS: dict[tuple, MCPClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _pooled_client(key: tuple, options: dict) -> MCPClient:
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None or not client.alive:
+            command, url = key
+            client = _CLIENTS[key] = MCPClient(command, url=url, **options)
+            client.pool_key, client.pool_options = key, options
+        return client
+
+
+def get_mcp_client(command: list[str] = None, *, url: str = None, **kwargs) -> MCPClient:
+    """
+    Process-wide client per server, started on first use and restarted if the server died. Tools of
+    a pooled client always call the current client of the pool, so they keep working after a restart.
+    """
+    return _pooled_client((tuple(command) if command else None, url), kwargs)
+
+
+def mcp_tools(command: list[str] = None, *, url: str = None, include: list[str] = None, **kwargs) -> list[MCPTool]:
+    """
+    Tools of a local MCP server, ready for `Agent(tools=...)` next to the python tool groups, e.g.
+    `tool_groups.FILE_TOOLS + mcp_tools(["python", "server.py"])`. `include` restricts the tools by name.
+    """
+    tools = get_mcp_client(command, url=url, **kwargs).list_tools()
+    return [tool for tool in tools if include is None or tool.__name__ in include]
+
+
+@atexit.register
+def _close_clients():
+    for client in _CLIENTS.values():
+        client.close()
@@ -0,0 +1,173 @@
+import time
+import sqlite3
+import threading
+import numpy as np
+from dataclasses import dataclass
+from model_registry import ModelRegistry, MODEL_REGISTRY
+
+
+@dataclass
+class MemoryItem():
+    """ Stored message returned by `MemoryStore.search` """
+    memory_id: int
+    role: str
+    content: str
+    session: str
+    created_at: float
+    score: float = 0.0
+
+
+class MemoryStore():
+    """
+    Long-term memory: messages stored in SQLite together with their embeddings, searched by cosine
+    similarity over an in-memory numpy matrix of unit-normalized embeddings.
+
+    Added messages are only embedded when needed, i.e. on the next `search` or `flush`, so all
+    pending messages and the search query go to Ollama's embedding endpoint in one batched call.
+
+    Args:
+        path: SQLite database file, ":memory:" for a store that lives as long as the process.
+        embedding_model: Ollama embedding model, e.g. "nomic-embed-text" or "mxbai-embed-large".
+        host: Ollama host serving the embedding model.
+        batch_size: Maximum number of texts per embedding request.
+        registry: Model registry providing the shared Ollama client.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        *,
+        embedding_model: str = "nomic-embed-text",
+        host: str = None,
+        batch_size: int = 64,
+        registry: ModelRegistry = None,
+        ):
+
+        self.path = path
+        self.embedding_model = embedding_model
+        self.host = host
+        self.batch_size = batch_size
+        self.registry = registry or MODEL_REGISTRY
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS memories ("
+            "memory_id INTEGER PRIMARY KEY, session TEXT, role TEXT, content TEXT, created_at REAL, embedding BLOB)"
+        )
+        self._connection.commit()
+
+        # Embedding matrix with spare capacity, row i belongs to self._ids[i]
+        self._matrix: np.ndarray = None
+        self._ids: list[int] = []
+        self._sessions: list[str] = []
+        self._pending: list[tuple[int, str, str]] = []
+        self._load()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def _load(self):
+        """ Read stored embeddings into the matrix and queue messages that were never embedded """
+        rows = self._connection.execute("SELECT memory_id, session, content, embedding FROM memories ORDER BY memory_id").fetchall()
+        embedded = [(memory_id, session, embedding) for memory_id, session, _, embedding in rows if embedding is not None]
+        self._pending = [(memory_id, content, session) for memory_id, session, content, embedding in rows if embedding is None]
+        if embedded:
+            vectors = np.stack([np.frombuffer(embedding, dtype=np.float32) for _, _, embedding in embedded])
+            self._append(vectors, [memory_id for memory_id, _, _ in embedded], [session for _, session, _ in embedded])
+
+    def _append(self, vectors: np.ndarray, ids: list[int], sessions: list[str]):
+        n = len(self._ids)
+        if self._matrix is None:
+            self._matrix = np.empty((max(64, 2 * len(ids)), vectors.shape[1]), dtype=np.float32)
+        elif n + len(ids) > len(self._matrix):
+            grown = np.empty((max(2 * len(self._matrix), n + len(ids)), self._matrix.shape[1]), dtype=np.float32)
+            grown[:n] = self._matrix[:n]
+            self._matrix = grown
+        self._matrix[n:n + len(ids)] = vectors
+        self._ids.extend(ids)
+        self._sessions.extend(sessions)
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        """ Unit-normalized float32 embeddings, one request per `batch_size` texts """
+        client = self.registry.client(self.host)
+        batches = [client.embed(model=self.embedding_model, input=texts[i:i + self.batch_size]).embeddings for i in range(0, len(texts), self.batch_size)]
+        vectors = np.asarray([vector for batch in batches for vector in batch], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    def add(self, messages: list[dict], *, session: str = "") -> list[int]:
+        """ Store messages ({"role": ..., "content": ...}), they are embedded lazily in one batch """
+        now = time.time()
+        with self._lock:
+            ids = []
+            for message in messages:
+                cursor = self._connection.execute(
+                    "INSERT INTO memories (session, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    (session, message["role"], message["content"], now),
+                )
+                ids.append(cursor.lastrowid)
+                self._pending.append((cursor.lastrowid, message["content"], session))
+            self._connection.commit()
+        return ids
+
+    def _flush(self, extra_texts: list[str] = ()) -> np.ndarray:
+        """ Embed pending messages together with `extra_texts`, returns the embeddings of `extra_texts` """
+        pending = self._pending
+        vectors = self._embed([content for _, content, _ in pending] + list(extra_texts)) if (pending or extra_texts) else None
+        if pending:
+            ids = [memory_id for memory_id, _, _ in pending]
+            self._connection.executemany(
+                "UPDATE memories SET embedding = ? WHERE memory_id = ?",
+                [(vector.tobytes(), memory_id) for vector, memory_id in zip(vectors, ids)],
+            )
+            self._connection.commit()
+            self._append(vectors[:len(pending)], ids, [session for _, _, session in pending])
+            self._pending = []
+        return vectors[len(pending):] if vectors is not None else None
+
+    def flush(self):
+        """ Embed all pending messages now """
+        with self._lock:
+            self._flush()
+
+    def search(self, query: str, k: int = 4, *, session: str = None, min_score: float = 0.0, exclude_ids: set[int] = ()) -> list[MemoryItem]:
+        """ The `k` stored messages most similar to `query`, optionally restricted to one session """
+        with self._lock:
+            if not (self._ids or self._pending):
+                return []
+            query_vector = self._flush([query])[0]
+            n = len(self._ids)
+            if n == 0:
+                return []
+            scores = self._matrix[:n] @ query_vector
+            mask = scores >= min_score
+            if session is not None:
+                mask &= np.asarray(self._sessions) == session
+            if exclude_ids:
+                mask &= ~np.isin(np.asarray(self._ids), list(exclude_ids))
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates])]
+            ids = [self._ids[i] for i in candidates]
+
+            rows = {}
+            if ids:
+                rows = {row[0]: row for row in self._connection.execute(
+                    f"SELECT memory_id, role, content, session, created_at FROM memories WHERE memory_id IN ({','.join('?' * len(ids))})", ids
+                ).fetchall()}
+        return [MemoryItem(*rows[memory_id], score=float(scores[i])) for memory_id, i in zip(ids, candidates)]
+
+    def clear(self, session: str = None):
+        """ Delete all memories, or those of one session """
+        with self._lock:
+            if session is None:
+                self._connection.execute("DELETE FROM memories")
+            else:
+                self._connection.execute("DELETE FROM memories WHERE session = ?", (session,))
+            self._connection.commit()
+            self._matrix, self._ids, self._sessions, self._pending = None, [], [], []
+            self._load()
+
+    def close(self):
+        self._connection.close()
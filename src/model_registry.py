@@ -0,0 +1,77 @@
+import time
+import ollama
+import threading
+from host_pool import HostPool
+
+
+class ModelRegistry():
+    """
+    Process-wide cache of the local model list and model capabilities per Ollama host.
+
+    `LLM` and `Agent` consult the registry instead of calling `ollama.list()` and `ollama.show()`
+    on every construction. Entries expire after `ttl_seconds` and can be dropped explicitly with
+    `invalidate`, e.g. after pulling or deleting a model.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        self.ttl_seconds = ttl_seconds
+        self._clients: dict[str | None, ollama.Client] = {}
+        self._models: dict[str | None, tuple[float, set[str]]] = {}
+        self._capabilities: dict[tuple[str | None, str], tuple[float, list[str]]] = {}
+        self._lock = threading.Lock()
+
+    def client(self, host: str | HostPool = None) -> ollama.Client | HostPool:
+        """ Shared sync client for `host`, a `HostPool` acts as its own client """
+        if isinstance(host, HostPool):
+            return host
+        with self._lock:
+            if host not in self._clients:
+                self._clients[host] = ollama.Client(host)
+            return self._clients[host]
+
+    def _is_fresh(self, timestamp: float) -> bool:
+        return (time.monotonic() - timestamp) < self.ttl_seconds
+
+    def available_models(self, host: str = None, *, refresh: bool = False) -> set[str]:
+        """ Names of all local models on `host` """
+        entry = self._models.get(host)
+        if refresh or (entry is None) or not self._is_fresh(entry[0]):
+            models = {x.model for x in self.client(host).list().models}
+            entry = (time.monotonic(), models)
+            with self._lock:
+                self._models[host] = entry
+        return entry[1]
+
+    def resolve_model(self, model_name: str, host: str = None) -> str | None:
+        """ Full local name matching `model_name` (e.g. 'llama3.2' -> 'llama3.2:latest'), None if not pulled """
+        for refresh in (False, True):
+            models = self.available_models(host, refresh=refresh)
+            if model_name in models:
+                return model_name
+            if f"{model_name}:latest" in models:
+                return f"{model_name}:latest"
+            if match := next((model for model in models if model.startswith(model_name)), None):
+                return match
+        return None
+
+    def capabilities(self, model_name: str, host: str = None) -> list[str]:
+        """ Capabilities reported by `ollama show` for `model_name` on `host` """
+        entry = self._capabilities.get((host, model_name))
+        if (entry is None) or not self._is_fresh(entry[0]):
+            entry = (time.monotonic(), list(self.client(host).show(model_name).capabilities or []))
+            with self._lock:
+                self._capabilities[(host, model_name)] = entry
+        return entry[1]
+
+    def invalidate(self, model_name: str = None, host: str = None):
+        """ Drop cached entries for one model on `host`, or everything when no model is given """
+        with self._lock:
+            if model_name is None:
+                self._models.clear()
+                self._capabilities.clear()
+            else:
+                self._models.pop(host, None)
+                self._capabilities.pop((host, model_name), None)
+
+
+MODEL_REGISTRY = ModelRegistry()
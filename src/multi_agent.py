@@ -0,0 +1,118 @@
+import time
+import inspect
+import threading
+from typing import Callable
+from pydantic import BaseModel
+from llm import AsyncLLM
+from agents import Agent, _role
+from budget import Budget, SubAgentResult
+from tool_executor import ToolExecutor, run_coroutine
+
+USAGE_KEYS = ("calls", "failures", "seconds", "model_calls", "prompt_tokens", "completion_tokens")
+
+
+def _isolated_fork(agent: Agent, budget: Budget = None) -> Agent:
+    """ Fork holding only the system prompt, so sub-agent calls neither see nor change the agent's conversation """
+    sub_agent = agent.fork()
+    sub_agent.messages = [message for message in sub_agent.messages if _role(message) == "system"]
+    sub_agent._turn_memory_ids = []
+    if budget is not None:
+        sub_agent.budget = budget
+        if budget.max_steps is not None:
+            sub_agent.n_max_steps = budget.max_steps
+    return sub_agent
+
+
+def _result(name: str, sub_agent: Agent, output, error: Exception, t_start: float) -> SubAgentResult:
+    usage = {
+        "calls": 1,
+        "failures": int(error is not None),
+        "seconds": time.perf_counter() - t_start,
+        "model_calls": sub_agent.request_stats["model_calls"],
+        "prompt_tokens": sub_agent.request_stats["prompt_tokens"],
+        "completion_tokens": sub_agent.request_stats["completion_tokens"],
+    }
+    if error is not None:
+        output = f"Error: Agent {name} failed: {error}"
+    elif isinstance(output, BaseModel):
+        output = output.model_dump_json()
+    return SubAgentResult(output=str(output), usage=usage)
+
+
+def agent_as_tool(agent: Agent, *, name: str = None, description: str = None, budget: Budget = None) -> Callable[[str], SubAgentResult]:
+    """
+    Expose `agent` as a tool. Every call runs the task on an isolated fork of the agent (its system
+    prompt only), so concurrent calls are independent. The tool returns a `SubAgentResult` whose
+    usage (model calls, tokens, wall time) is added to the calling agent's request stats, and the
+    accumulated usage of all calls is kept in `tool.usage`.
+
+    Args:
+        agent: Agent handling the delegated tasks.
+        name: Tool name, defaults to the agent name.
+        description: Tool description shown to the calling model.
+        budget: Limits of every delegated request, defaults to the agent's own budget.
+    """
+    name = name or agent.agent_name
+    usage = dict.fromkeys(USAGE_KEYS, 0)
+    lock = threading.Lock()
+
+    def record(result: SubAgentResult) -> SubAgentResult:
+        with lock:
+            for key, value in result.usage.items():
+                usage[key] += value
+        return result
+
+    if isinstance(agent.llm, AsyncLLM):
+        async def run(task: str) -> SubAgentResult:
+            sub_agent, t_start, output, error = _isolated_fork(agent, budget), time.perf_counter(), None, None
+            try:
+                output = await sub_agent.ainvoke(task)
+            except Exception as e:
+                error = e
+            return record(_result(name, sub_agent, output, error, t_start))
+    else:
+        def run(task: str) -> SubAgentResult:
+            sub_agent, t_start, output, error = _isolated_fork(agent, budget), time.perf_counter(), None, None
+            try:
+                output = sub_agent.invoke(task)
+            except Exception as e:
+                error = e
+            return record(_result(name, sub_agent, output, error, t_start))
+
+    if description is None:
+        description = f"Delegate a subtask to the {name} agent and return its answer."
+        if agent.available_tools:
+            description += f" The agent can use the tools: {', '.join(sorted(agent.available_tools))}."
+    run.__name__ = name
+    run.__qualname__ = name
+    run.__doc__ = f"""
+    {description}
+
+    Args:
+        task (str): Complete, self-contained description of the subtask including all information the agent needs.
+
+    Returns:
+        str: The answer of the agent.
+    """
+    run.agent = agent
+    run.usage = usage
+    return run
+
+
+def fan_out(tools: dict[str, Callable[[str], SubAgentResult]], assignments: list[tuple[str, str]], *, max_concurrency: int = 4) -> list[SubAgentResult]:
+    """
+    Run (tool name, task) assignments on sub-agent tools concurrently without a supervising model,
+    results are returned in input order.
+    """
+    unknown = {name for name, _ in assignments if name not in tools}
+    assert not unknown, f"Unknown sub-agents {sorted(unknown)}, available: {sorted(tools)}"
+
+    def run(assignment: tuple[str, str]) -> SubAgentResult:
+        tool = tools[assignment[0]]
+        return run_coroutine(tool(assignment[1])) if inspect.iscoroutinefunction(tool) else tool(assignment[1])
+
+    executor = ToolExecutor(max_concurrency=max_concurrency)
+    try:
+        return executor.map(run, assignments)
+    finally:
+        executor.shutdown()
@@ -2,6 +2,8 @@ import tool_groups
 from llm import LLM
 import default_prompts
 from agents import Agent
+from budget import Budget, SubAgentResult
+from multi_agent import agent_as_tool, fan_out
 from typing import Callable
 
 class ReActAgent(Agent):
@@ -47,6 +49,36 @@ class CodingAgent(Agent):
             *args,
             **kwargs,
         )
+
+
+class SupervisorAgent(Agent):
+    """
+    Routes subtasks to sub-agents exposed as tools. Independent subtasks requested in the same model
+    turn run concurrently, and the usage of every sub-agent is aggregated in `sub_agent_usage` and in
+    the supervisor's request stats.
+    """
+    def __init__(self, llm: LLM, agents: list[Agent], *args, tools: list[Callable] = None, sub_agent_budget: Budget = None, **kwargs):
+        names = [agent.agent_name for agent in agents]
+        assert len(set(names)) == len(names), f"Sub-agent names must be unique but got {names}"
+        self.sub_agent_tools = {agent.agent_name: agent_as_tool(agent, budget=sub_agent_budget) for agent in agents}
+        kwargs.setdefault("max_tool_concurrency", len(agents))
+        super().__init__(
+            agent_name="supervisor_agent",
+            llm=llm,
+            tools=list(self.sub_agent_tools.values()) + (tools or []),
+            system_prompt=default_prompts.SUPERVISOR_AGENT_PROMPT,
+            *args,
+            **kwargs,
+        )
+
+    @property
+    def sub_agent_usage(self) -> dict[str, dict]:
+        """ Accumulated calls, failures, wall time, model calls and tokens per sub-agent """
+        return {name: dict(tool.usage) for name, tool in self.sub_agent_tools.items()}
+
+    def delegate(self, assignments: list[tuple[str, str]], *, max_concurrency: int = None) -> list[SubAgentResult]:
+        """ Run (sub-agent name, task) pairs directly and concurrently, without the supervisor model """
+        return fan_out(self.sub_agent_tools, assignments, max_concurrency=max_concurrency or len(self.sub_agent_tools))
     
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pydantic import BaseModel
+from ollama import ChatResponse
+from ollama._utils import convert_function_to_tool
+
+
+def _canonical(value):
+    """ Convert messages, tools, options and schemas into plain JSON-compatible values """
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", exclude_none=True)
+    if callable(value):
+        return convert_function_to_tool(value).model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, bytes):
+        return hashlib.sha256(value).hexdigest()
+    return value
+
+
+def make_cache_key(chat_kwargs: dict) -> str:
+    """ Canonical hash of the model, messages, tool schemas, format, thinking flag and options of a chat call """
+    payload = {k: _canonical(chat_kwargs.get(k)) for k in ("model", "messages", "tools", "format", "think", "options")}
+    serialized = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class ResponseCache():
+    """ Base class for `LLM` response caches, keeps hit/miss statistics """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> ChatResponse | None:
+        response = self._get(key)
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def put(self, key: str, response: ChatResponse):
+        self._put(key, response)
+
+    def _get(self, key: str) -> ChatResponse | None:
+        raise NotImplementedError
+
+    def _put(self, key: str, response: ChatResponse):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self),
+        }
+
+
+class LRUResponseCache(ResponseCache):
+    """ In-memory cache that evicts the least recently used response beyond `max_size` entries """
+
+    def __init__(self, max_size: int = 1024):
+        super().__init__()
+        assert max_size > 0, f"max_size must be positive but got {max_size}"
+        self.max_size = max_size
+        self._entries: OrderedDict[str, ChatResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> ChatResponse | None:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def _put(self, key: str, response: ChatResponse):
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """ On-disk cache in a SQLite file, shared between processes and runs """
+
+    def __init__(self, path: str, max_size: int = None):
+        super().__init__()
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, accessed REAL NOT NULL)")
+
+    def _get(self, key: str) -> ChatResponse | None:
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+        return ChatResponse.model_validate_json(row[0])
+
+    def _put(self, key: str, response: ChatResponse):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, accessed) VALUES (?, ?, ?)",
+                (key, response.model_dump_json(exclude_none=True), time.time()),
+            )
+            if self.max_size:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key NOT IN (SELECT key FROM responses ORDER BY accessed DESC LIMIT ?)",
+                    (self.max_size,),
+                )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self):
+        self._connection.close()
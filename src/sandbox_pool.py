@@ -0,0 +1,184 @@
+import os
+import queue
+import atexit
+import threading
+import multiprocessing
+from typing import Callable, Any
+
+try:
+    import resource
+except ImportError:  # Windows, rlimits are not available
+    resource = None
+
+
+class SandboxError(RuntimeError):
+    pass
+
+
+def _worker_main(connection, target: Callable, memory_limit_mb: int, cpu_time_limit_seconds: int, max_runs: int):
+    """ Worker loop: apply rlimits once, then serve up to `max_runs` jobs before exiting """
+    if resource and memory_limit_mb:
+        memory_limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    for _ in range(max_runs):
+        try:
+            args, kwargs = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+
+        # CPU limit is cumulative for a process, so move the soft limit forward for every job
+        if resource and cpu_time_limit_seconds:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = int(usage.ru_utime + usage.ru_stime) + cpu_time_limit_seconds + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+        try:
+            result = ("ok", target(*args, **kwargs))
+        except BaseException as e:
+            result = ("error", f"{type(e).__name__}: {e}")
+        connection.send(result)
+
+
+class _Worker():
+
+    def __init__(self, context, target: Callable, memory_limit_mb: int, cpu_time_limit_seconds: int, max_runs: int):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_connection, target, memory_limit_mb, cpu_time_limit_seconds, max_runs),
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+        self.n_runs = 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class SandboxPool():
+    """
+    Pool of pre-started worker processes that run untrusted code out of the caller's process.
+
+    Every worker runs with its own address-space and CPU-time rlimits (Unix only), the wall-clock
+    timeout is enforced by the parent, which kills and replaces a worker that does not answer in
+    time, and workers are recycled after `max_runs` jobs. The pool is thread-safe, so any number of
+    threads or agents can dispatch to it concurrently; calls wait for a free worker.
+
+    With the "forkserver" and "spawn" start methods every worker re-imports the main module of the
+    program, so a script that uses the pool (e.g. through `CodingAgent` or `python_run`) must keep
+    its top-level code under an `if __name__ == "__main__":` guard. Without the guard every worker
+    re-runs the script and dies while starting up.
+
+    Args:
+        target: Module-level function executed in the workers.
+        n_workers: Number of worker processes.
+        memory_limit_mb: Address-space limit per worker, None to disable.
+        cpu_time_limit_seconds: CPU-time limit per job, None to disable.
+        max_runs: Jobs served by a worker before it is replaced by a fresh one.
+        start_method: multiprocessing start method, "forkserver" by default where available.
+    """
+
+    def __init__(
+        self,
+        target: Callable,
+        *,
+        n_workers: int = None,
+        memory_limit_mb: int = 512,
+        cpu_time_limit_seconds: int = 10,
+        max_runs: int = 100,
+        start_method: str = None,
+        ):
+
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.context = multiprocessing.get_context(start_method)
+        self.target = target
+        self.n_workers = n_workers or min(4, os.cpu_count() or 1)
+        self.memory_limit_mb = memory_limit_mb
+        self.cpu_time_limit_seconds = cpu_time_limit_seconds
+        self.max_runs = max_runs
+
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._workers: set[_Worker] = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self.n_workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.context, self.target, self.memory_limit_mb, self.cpu_time_limit_seconds, self.max_runs)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill()
+
+    def run(self, *args, timeout: float = 10, **kwargs) -> Any:
+        """ Run `target(*args, **kwargs)` on a free worker and return its result """
+        if self._closed:
+            raise SandboxError("Sandbox pool is closed")
+
+        worker = self._idle.get()
+        healthy = False
+        try:
+            worker.connection.send((args, kwargs))
+            if not worker.connection.poll(timeout):
+                raise TimeoutError("Execution timed out")
+            status, value = worker.connection.recv()
+            worker.n_runs += 1
+            healthy = worker.n_runs < self.max_runs
+        except TimeoutError:
+            raise
+        except (EOFError, OSError) as e:
+            worker.process.join(timeout=1)
+            if worker.n_runs == 0 and self.context.get_start_method() != "fork":
+                raise SandboxError(
+                    f"Sandbox worker died with exit code {worker.process.exitcode} before running any code, the code may have exceeded its memory "
+                    f"or CPU limit, or the main module re-runs the program on import (it needs an `if __name__ == \"__main__\":` guard)"
+                ) from e
+            raise SandboxError(f"Sandbox worker died with exit code {worker.process.exitcode}, the code may have exceeded its memory or CPU limit") from e
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                self._retire(worker)
+                if not self._closed:
+                    self._idle.put(self._spawn())
+
+        if status == "error":
+            raise SandboxError(value)
+        return value
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            self._retire(worker)
+
+
+_DEFAULT_POOLS: dict[Callable, SandboxPool] = {}
+_DEFAULT_POOLS_LOCK = threading.Lock()
+
+
+def get_sandbox_pool(target: Callable, **kwargs) -> SandboxPool:
+    """ Process-wide pool for `target`, started on first use. `kwargs` only apply on creation """
+    with _DEFAULT_POOLS_LOCK:
+        if target not in _DEFAULT_POOLS:
+            _DEFAULT_POOLS[target] = SandboxPool(target, **kwargs)
+        return _DEFAULT_POOLS[target]
+
+
+@atexit.register
+def _close_default_pools():
+    for pool in _DEFAULT_POOLS.values():
+        pool.close()
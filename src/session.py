@@ -0,0 +1,167 @@
+import os
+import json
+import time
+from typing import Iterator, TYPE_CHECKING
+from ollama import Message, Image
+
+if TYPE_CHECKING:
+    from agents import Agent
+
+SESSION_FORMAT_VERSION = 1
+DEFAULT_RESUME_TURNS = 20
+_READ_CHUNK_BYTES = 64 * 1024
+
+
+def dump_message(message: dict | Message) -> dict:
+    """ JSON-ready form of a message, images are stored base64 encoded and empty fields are dropped """
+    if isinstance(message, dict):
+        message = Message.model_validate({
+            key: [image if isinstance(image, Image) else Image(value=image) for image in value] if key == "images" else value
+            for key, value in message.items() if value is not None
+        })
+    return message.model_dump(mode="json", exclude_none=True)
+
+
+def _dumps(record: dict) -> str:
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+
+
+def _read_last_lines(path: str, n: int) -> list[bytes]:
+    """ Last `n` lines of a file, read backwards in chunks so earlier lines are never touched """
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        buffer = b""
+        while position > 0 and buffer.count(b"\n") <= n:
+            step = min(_READ_CHUNK_BYTES, position)
+            position -= step
+            f.seek(position)
+            buffer = f.read(step) + buffer
+    lines = buffer.splitlines()
+    if position > 0:
+        # The first line of the buffer may be cut off
+        lines = lines[1:]
+    return lines[-n:] if n else []
+
+
+class AgentSession():
+    """
+    Append-only JSON lines log of an agent conversation, used to persist and resume sessions.
+
+    The first line is a header with the agent name, model, bound tool names and system messages,
+    every following line holds the messages of one finished turn together with its request stats
+    and the running totals. Turns are appended as they finish, so the file is never rewritten,
+    and resuming only parses the header and the last `resume_turns` turns (read from the end of
+    the file), however long the session is. Replaying the whole history is opt-in with
+    `full_history=True`.
+
+    Attach it to an agent with `Agent(..., session=AgentSession(path))`: an existing log is
+    restored on construction and every turn is appended after `invoke`, `stream` or `ainvoke`.
+
+    Args:
+        path: JSON lines file of the session.
+        resume_turns: Number of most recent turns restored into `Agent.messages`.
+        full_history: Restore every turn of the session instead of the last `resume_turns`, this
+            parses the whole file.
+        fsync: Force every appended turn to disk before returning.
+    """
+
+    def __init__(self, path: str, *, resume_turns: int = DEFAULT_RESUME_TURNS, full_history: bool = False, fsync: bool = False):
+        assert resume_turns is not None and resume_turns >= 0, f"resume_turns must be a non-negative number of turns but got {resume_turns}, use full_history=True to restore all turns"
+        self.path = path
+        self.resume_turns = resume_turns
+        self.full_history = full_history
+        self.fsync = fsync
+        self._header: dict = None
+        self._totals: dict = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    @property
+    def header(self) -> dict | None:
+        if self._header is None and self.exists():
+            with open(self.path, "rb") as f:
+                self._header = json.loads(f.readline())
+        return self._header
+
+    @property
+    def totals(self) -> dict:
+        """ Running totals (turns, model calls, tool calls, ...) stored with the last turn """
+        if self._totals is None:
+            last = _read_last_lines(self.path, 1) if self.exists() else []
+            record = json.loads(last[0]) if last else {}
+            self._totals = record.get("totals", {"turns": 0})
+        return self._totals
+
+    def turns(self, start: int = 0) -> Iterator[dict]:
+        """ Lazily parse the turn records from turn `start` on """
+        if not self.exists():
+            return
+        with open(self.path, "rb") as f:
+            f.readline()
+            for i, line in enumerate(f):
+                if i >= start and line.strip():
+                    yield json.loads(line)
+
+    def last_turns(self, n: int) -> list[dict]:
+        if not self.exists():
+            return []
+        lines = [line for line in _read_last_lines(self.path, n + 1) if line.strip()]
+        records = [json.loads(line) for line in lines]
+        return [record for record in records if record.get("type") == "turn"][-n:] if n else []
+
+    def _write(self, record: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(_dumps(record) + "\n")
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record_turn(self, agent: "Agent", messages: list[dict | Message], n_tool_calls: int = 0):
+        """ Append the messages of a finished turn, writing the header first for a new session """
+        if not self.exists():
+            self._header = {
+                "type": "header",
+                "version": SESSION_FORMAT_VERSION,
+                "agent_name": agent.agent_name,
+                "model": agent.llm.model_name,
+                "tools": sorted(agent.available_tools),
+                "system": [dump_message(message) for message in agent.messages if (message.get("role") if isinstance(message, dict) else message.role) == "system"],
+                "created_at": time.time(),
+            }
+            self._write(self._header)
+            self._totals = {"turns": 0}
+
+        totals = dict(self.totals)
+        totals["turns"] = totals.get("turns", 0) + 1
+        totals["tool_calls"] = totals.get("tool_calls", 0) + n_tool_calls
+        for key, value in agent.request_stats.items():
+            totals[key] = totals.get(key, 0) + value
+        self._write({
+            "type": "turn",
+            "turn": totals["turns"] - 1,
+            "time": time.time(),
+            "messages": [dump_message(message) for message in messages],
+            "stats": {**agent.request_stats, "tool_calls": n_tool_calls},
+            "totals": totals,
+        })
+        self._totals = totals
+
+    def restore(self, agent: "Agent", last_turns: int | None = None, *, full_history: bool | None = None):
+        """
+        Replace the agent's conversation with the system messages and the last turns of the session,
+        `last_turns` and `full_history` default to the values the session was created with
+        """
+        header = self.header
+        if header is None:
+            return
+        if header.get("tools") != sorted(agent.available_tools):
+            print(f"Warning: Session {self.path} was recorded with tools {header.get('tools')} but agent {agent.agent_name} has {sorted(agent.available_tools)}")
+
+        full_history = self.full_history if full_history is None else full_history
+        last_turns = self.resume_turns if last_turns is None else last_turns
+        turns = self.turns() if full_history else self.last_turns(last_turns)
+        messages = [Message.model_validate(message) for message in header.get("system", [])]
+        for turn in turns:
+            messages.extend(Message.model_validate(message) for message in turn["messages"])
+        agent.messages = messages
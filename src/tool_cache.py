@@ -0,0 +1,115 @@
+import json
+import inspect
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+
+def pure(tool: Callable) -> Callable:
+    """
+    Mark a tool as pure: its output only depends on its arguments and calling it has no side effects.
+    Results of pure tools are memoized in the agent's `ToolResultCache`, and agents with
+    `speculative_tools=True` run them while the model turn that requested them is still streaming.
+    """
+    assert not inspect.iscoroutinefunction(tool), f"Only sync tools can be marked pure, {tool.__name__} is a coroutine function"
+    tool.is_pure = True
+    return tool
+
+
+def is_pure(tool: Callable) -> bool:
+    return getattr(tool, "is_pure", False)
+
+
+def make_tool_key(tool: Callable, arguments: dict) -> str:
+    """
+    Key of a tool call. The tool is identified by module, qualified name and object identity, so
+    equally named tools of different modules (or different closures of one function) never share
+    results. The cache keeps a reference to the tool with every entry, so its id cannot be reused.
+    """
+    identity = [getattr(tool, "__module__", None), getattr(tool, "__qualname__", getattr(tool, "__name__", None)), id(tool)]
+    serialized = json.dumps([identity, arguments], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class ToolResultCache():
+    """
+    In-memory LRU cache of pure tool results, keyed on the tool (see `make_tool_key`) and arguments.
+
+    A call whose result is being computed (e.g. by a speculative run) is not started a second
+    time: later identical calls wait for the running one and share its result. Exceptions are
+    passed on to the waiting calls but not cached.
+    """
+
+    def __init__(self, max_size: int = 4096, max_speculative_workers: int = 4):
+        assert max_size > 0, f"max_size must be positive but got {max_size}"
+        self.max_size = max_size
+        self.max_speculative_workers = max_speculative_workers
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[Callable, Any]] = OrderedDict()
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor = None
+
+    def get_or_run(self, tool: Callable, arguments: dict) -> Any:
+        """ Cached result of `tool(**arguments)`, the tool only runs if the result is neither cached nor being computed """
+        key = make_tool_key(tool, arguments)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][1]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._in_flight[key] = Future()
+            else:
+                self.hits += 1
+        if not owner:
+            return future.result()
+
+        try:
+            result = tool(**arguments)
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._entries[key] = (tool, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._in_flight.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def prefetch(self, tool: Callable, arguments: dict) -> Future:
+        """ Start computing the result in the background, a later `get_or_run` of the same call picks it up """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_speculative_workers, thread_name_prefix="speculative-tool")
+        return self._pool.submit(self.get_or_run, tool, arguments)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self),
+        }
+
+
+# Shared by all agents of the process unless an agent is given its own cache
+TOOL_CACHE = ToolResultCache()
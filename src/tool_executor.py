@@ -0,0 +1,96 @@
+import asyncio
+import functools
+import threading
+from typing import Callable, Awaitable, Coroutine, Any
+from concurrent.futures import ThreadPoolExecutor, Future
+
+
+class ToolExecutor():
+    """
+    Dispatches the tool calls of a single agent step concurrently.
+
+    Sync calls are spread over a thread pool and coroutine calls are gathered on the running
+    event loop. Results are always returned in the order of the input calls so that the
+    transcript stays deterministic regardless of which call finishes first.
+    """
+
+    def __init__(self, max_concurrency: int = 1):
+        assert isinstance(max_concurrency, int) and max_concurrency >= 1, f"max_concurrency must be a positive integer but got {max_concurrency}"
+        self.max_concurrency = max_concurrency
+        self._pool: ThreadPoolExecutor = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="tool")
+        return self._pool
+
+    def map(self, fn: Callable[[Any], Any], items: list) -> list:
+        """ Apply `fn` to every item, concurrently when allowed, and return results in input order """
+        if (self.max_concurrency == 1) or (len(items) <= 1):
+            return [fn(item) for item in items]
+        return list(self.pool.map(fn, items))
+
+    def submit(self, fn: Callable[[Any], Any], item: Any) -> Future:
+        """ Start `fn(item)` right away; without concurrency it runs inline and a completed future is returned """
+        if self.max_concurrency > 1:
+            return self.pool.submit(fn, item)
+        future = Future()
+        try:
+            future.set_result(fn(item))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    async def amap(self, fn: Callable[[Any], Awaitable[Any]], items: list) -> list:
+        """ Await `fn` for every item with at most `max_concurrency` in flight, results in input order """
+        if (self.max_concurrency == 1) or (len(items) <= 1):
+            return [await fn(item) for item in items]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _bounded(item):
+            async with semaphore:
+                return await fn(item)
+
+        return await asyncio.gather(*[_bounded(item) for item in items])
+
+    async def run_in_thread(self, fn: Callable, /, **kwargs) -> Any:
+        """
+        Run a blocking function without blocking the event loop. Without step concurrency the loop's
+        default executor is used, a one-thread pool would serialize the tool calls of every session
+        sharing this executor (e.g. the forks of `ainvoke_many`).
+        """
+        if self.max_concurrency == 1:
+            return await asyncio.to_thread(fn, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, functools.partial(fn, **kwargs))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+_LOOP: asyncio.AbstractEventLoop = None
+_LOOP_THREAD: threading.Thread = None
+_LOOP_LOCK = threading.Lock()
+
+
+def run_coroutine(coroutine: Coroutine) -> Any:
+    """
+    Run a coroutine to completion from sync code, e.g. a coroutine tool called by `Agent.invoke` or
+    an async sub-agent of `fan_out`. All such calls share one persistent background event loop, so
+    loop-bound resources like the `ollama.AsyncClient` of an `AsyncLLM` stay usable between calls.
+    """
+    global _LOOP, _LOOP_THREAD
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            _LOOP_THREAD = threading.Thread(target=_LOOP.run_forever, name="coroutine-tools", daemon=True)
+            _LOOP_THREAD.start()
+    if threading.current_thread() is _LOOP_THREAD:
+        # Blocking the shared loop on itself would deadlock, run on a private loop in another thread
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, coroutine).result()
+    return asyncio.run_coroutine_threadsafe(coroutine, _LOOP).result()
@@ -13,14 +13,22 @@ MATH_TOOLS = [
     tangent,
     logarithm,
     absolute_value,
+    elementwise,
+    array_reduce,
+    array_statistics,
+    linear_algebra,
+    evaluate_expression,
 ]
 
 FILE_TOOLS = [
     read_file,
+    read_lines,
+    grep_file,
     read_images,
     write_file,
     append_to_file,
     edit_file,
+    replace_lines,
     list_files,
 ]
 
@@ -0,0 +1,175 @@
+import json
+import types
+import inspect
+import weakref
+from typing import Annotated, Any, Callable, NotRequired, TypedDict, Union, get_args, get_origin, get_type_hints
+from pydantic import BeforeValidator, ConfigDict, TypeAdapter, ValidationError
+from ollama import Tool
+from ollama._utils import convert_function_to_tool
+
+
+class FrozenTool(Tool):
+    """ Tool schema compiled once from a python callable and shared between requests """
+    model_config = ConfigDict(frozen=True)
+
+
+_TOOL_SCHEMAS: weakref.WeakKeyDictionary[Callable, FrozenTool] = weakref.WeakKeyDictionary()
+
+
+def _compile(tool: Callable) -> FrozenTool:
+    return FrozenTool.model_validate(convert_function_to_tool(tool).model_dump(exclude_none=True, by_alias=True))
+
+
+def compile_tool(tool: Callable) -> FrozenTool:
+    """
+    Build the JSON schema of a tool from its signature and Google-style docstring.
+
+    Schemas are cached by function identity (bound methods by their underlying function), so the
+    signature and docstring of each tool are only inspected once per process instead of on every
+    `client.chat` call. Callables that already know their schema (e.g. MCP tools) provide it as a
+    `tool_schema` attribute.
+    """
+    if (schema := getattr(tool, "tool_schema", None)) is not None:
+        return schema
+    key = getattr(tool, "__func__", tool)
+    try:
+        schema = _TOOL_SCHEMAS.get(key)
+    except TypeError:
+        # Not weak-referenceable, compile without caching
+        return _compile(tool)
+    if schema is None:
+        schema = _TOOL_SCHEMAS[key] = _compile(tool)
+    return schema
+
+
+def compile_tools(tools: list[Callable]) -> list[FrozenTool]:
+    return [compile_tool(tool) for tool in tools]
+
+
+def required_arguments(tool: Callable) -> set[str] | None:
+    """
+    Names of the arguments every call of the tool must pass: parameters without a default, or the
+    `required` list of a `tool_schema`. The compiled schema cannot be used for this, it lists every
+    parameter that is not Optional as required, defaults or not. None if the tool cannot be inspected.
+    """
+    if (schema := getattr(tool, "tool_schema", None)) is not None:
+        parameters = schema.function.parameters
+        return set(parameters.required or []) if parameters is not None else set()
+    try:
+        signature = inspect.signature(tool)
+    except (TypeError, ValueError):
+        return None
+    return {
+        name for name, parameter in signature.parameters.items()
+        if parameter.default is parameter.empty and parameter.kind not in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD)
+    }
+
+
+# Argument validation
+
+ArgumentValidator = Callable[[dict], dict]
+
+_TOOL_VALIDATORS: weakref.WeakKeyDictionary[Callable, ArgumentValidator | None] = weakref.WeakKeyDictionary()
+_JSON_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool, "array": list, "object": dict, "null": type(None)}
+
+
+def _parse_json_string(value: Any) -> Any:
+    """ Models often send lists and objects JSON-encoded as strings, decode them before validation """
+    if isinstance(value, str) and value.lstrip()[:1] in ("[", "{"):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    return value
+
+
+def _is_container(annotation: Any) -> bool:
+    origin = get_origin(annotation) or annotation
+    if origin in (Union, types.UnionType):
+        return any(_is_container(arg) for arg in get_args(annotation))
+    return origin in (list, tuple, set, dict)
+
+
+def _field(annotation: Any, required: bool) -> Any:
+    if _is_container(annotation):
+        annotation = Annotated[annotation, BeforeValidator(_parse_json_string)]
+    return annotation if required else NotRequired[annotation]
+
+
+def _fields_from_signature(tool: Callable) -> tuple[dict[str, Any], bool] | None:
+    try:
+        signature = inspect.signature(tool)
+        hints = get_type_hints(tool)
+    except (TypeError, ValueError, NameError):
+        return None
+    fields, allow_extra = {}, False
+    for name, parameter in signature.parameters.items():
+        if parameter.kind == parameter.VAR_KEYWORD:
+            allow_extra = True
+        elif parameter.kind != parameter.VAR_POSITIONAL:
+            annotation = hints.get(name, Any)
+            if parameter.default is None:
+                # Models send null for optional arguments they do not use
+                annotation = annotation | None if annotation is not Any else Any
+            fields[name] = _field(annotation, parameter.default is parameter.empty)
+    return fields, allow_extra
+
+
+def _fields_from_json_schema(parameters: Any) -> tuple[dict[str, Any], bool]:
+    """ Top-level fields of a tool's JSON schema, for tools without a python signature (e.g. MCP tools) """
+    parameters = parameters.model_dump(exclude_none=True) if hasattr(parameters, "model_dump") else (parameters or {})
+    required = set(parameters.get("required") or [])
+    fields = {}
+    for name, spec in (parameters.get("properties") or {}).items():
+        types = spec.get("type") if isinstance(spec, dict) else None
+        types = [t.strip() for t in types.split(",")] if isinstance(types, str) else (types or [])
+        python_types = [_JSON_TYPES[t] for t in types if t in _JSON_TYPES]
+        annotation = Union[tuple(python_types)] if python_types else Any
+        fields[name] = _field(annotation, name in required)
+    return fields, parameters.get("additionalProperties", True) is not False
+
+
+def _compile_validator(tool: Callable) -> ArgumentValidator | None:
+    if (schema := getattr(tool, "tool_schema", None)) is not None:
+        fields, allow_extra = _fields_from_json_schema(schema.function.parameters)
+    elif (signature_fields := _fields_from_signature(tool)) is not None:
+        fields, allow_extra = signature_fields
+    else:
+        return None
+    arguments_type = TypedDict(f"{getattr(tool, '__name__', 'tool')}_arguments", fields)
+    arguments_type.__pydantic_config__ = ConfigDict(extra="allow" if allow_extra else "forbid")
+    return TypeAdapter(arguments_type).validate_python
+
+
+def compile_validator(tool: Callable) -> ArgumentValidator | None:
+    """
+    Build a function that validates and coerces the arguments of a tool call (e.g. "3" to 3.0 for a
+    float parameter) and raises `pydantic.ValidationError` on missing, unknown or invalid arguments.
+
+    Validators are compiled from the type hints (or the `tool_schema` of MCP tools) once per tool
+    and cached like the schemas, a validation then takes a few microseconds. Returns None for
+    callables whose signature cannot be inspected.
+    """
+    key = getattr(tool, "__func__", tool)
+    try:
+        if key in _TOOL_VALIDATORS:
+            return _TOOL_VALIDATORS[key]
+    except TypeError:
+        # Not weak-referenceable, compile without caching
+        return _compile_validator(tool)
+    validator = _TOOL_VALIDATORS[key] = _compile_validator(tool)
+    return validator
+
+
+def format_validation_error(tool_name: str, error: ValidationError, max_input_chars: int = 40) -> str:
+    """ Compact, model-readable description of invalid tool arguments """
+    problems = []
+    for item in error.errors(include_url=False):
+        name = ".".join(str(part) for part in item["loc"])
+        if item["type"] in ("missing", "extra_forbidden"):
+            problems.append(f"{name}: {'missing' if item['type'] == 'missing' else 'unknown argument'}")
+        else:
+            value = repr(item["input"])
+            value = value if len(value) <= max_input_chars else value[:max_input_chars] + "..."
+            problems.append(f"{name}: {item['msg']} (got {value})")
+    return f"Error: Invalid arguments for {tool_name}: {'; '.join(problems)}"
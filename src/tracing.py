@@ -0,0 +1,162 @@
+import json
+import time
+import uuid
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Any
+from ollama import ChatResponse
+
+NANOSECONDS = 1e9
+
+RESPONSE_TIMING_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+
+@dataclass
+class Span:
+    """ Timed unit of work: an agent request, a loop step, a model call or a tool call """
+    name: str
+    span_id: str
+    parent_id: str | None
+    start_time: float
+    end_time: float | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+    _t_start: float = field(default=0.0, repr=False)
+    _t_end: float = field(default=0.0, repr=False)
+
+    @property
+    def duration_seconds(self) -> float:
+        return self._t_end - self._t_start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_response(self, response: ChatResponse):
+        """ Copy the timing and token counters reported by Ollama onto the span """
+        for key in RESPONSE_TIMING_FIELDS:
+            if (value := getattr(response, key, None)) is not None:
+                self.attributes[key] = value
+        if response.done_reason:
+            self.attributes["done_reason"] = response.done_reason
+
+    def to_dict(self) -> dict:
+        span = {k: v for k, v in asdict(self).items() if not k.startswith("_")}
+        span["duration_seconds"] = self.duration_seconds
+        return span
+
+
+class Tracer():
+    """
+    Collects spans from agents and keeps aggregated per-agent statistics.
+
+    Every finished span is passed to the registered callbacks, e.g. `JSONLinesExporter`, so spans
+    can be streamed to a file or forwarded to another tracing backend. Spans are also kept in
+    memory (at most `max_spans`) for inspection.
+
+    Span names emitted by `Agent`: "agent.invoke", "agent.step", "llm.generate" and "tool.call".
+    """
+
+    def __init__(self, callbacks: list[Callable[[Span], None]] = None, *, max_spans: int = 10_000):
+        self.callbacks = list(callbacks or [])
+        self.max_spans = max_spans
+        self.spans: list[Span] = []
+        self._stats: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback: Callable[[Span], None]):
+        self.callbacks.append(callback)
+
+    def start_span(self, name: str, *, parent: Span = None, **attributes) -> Span:
+        return Span(
+            name=name,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start_time=time.time(),
+            attributes=attributes,
+            _t_start=time.perf_counter(),
+        )
+
+    def end_span(self, span: Span):
+        span._t_end = time.perf_counter()
+        span.end_time = time.time()
+        with self._lock:
+            self.spans.append(span)
+            if len(self.spans) > self.max_spans:
+                del self.spans[:len(self.spans) - self.max_spans]
+            self._aggregate(span)
+        for callback in self.callbacks:
+            callback(span)
+
+    def _aggregate(self, span: Span):
+        agent = span.attributes.get("agent", "")
+        stats = self._stats.setdefault(agent, {
+            "requests": 0, "request_seconds": 0.0, "steps": 0,
+            "llm_calls": 0, "llm_seconds": 0.0, "load_seconds": 0.0,
+            "prompt_eval_count": 0, "prompt_eval_seconds": 0.0,
+            "eval_count": 0, "eval_seconds": 0.0, "thinking_seconds": 0.0,
+            "tool_calls": 0, "tool_seconds": 0.0, "tool_errors": 0, "tools": {},
+        })
+        attributes = span.attributes
+        if span.name == "agent.invoke":
+            stats["requests"] += 1
+            stats["request_seconds"] += span.duration_seconds
+        elif span.name == "agent.step":
+            stats["steps"] += 1
+        elif span.name == "llm.generate":
+            stats["llm_calls"] += 1
+            stats["llm_seconds"] += span.duration_seconds
+            stats["load_seconds"] += attributes.get("load_duration", 0) / NANOSECONDS
+            stats["prompt_eval_count"] += attributes.get("prompt_eval_count", 0)
+            stats["prompt_eval_seconds"] += attributes.get("prompt_eval_duration", 0) / NANOSECONDS
+            stats["eval_count"] += attributes.get("eval_count", 0)
+            stats["eval_seconds"] += attributes.get("eval_duration", 0) / NANOSECONDS
+            stats["thinking_seconds"] += attributes.get("thinking_seconds", 0.0)
+        elif span.name == "tool.call":
+            tool = stats["tools"].setdefault(attributes.get("tool_name"), {"calls": 0, "seconds": 0.0, "errors": 0})
+            stats["tool_calls"] += 1
+            stats["tool_seconds"] += span.duration_seconds
+            tool["calls"] += 1
+            tool["seconds"] += span.duration_seconds
+            if span.error:
+                stats["tool_errors"] += 1
+                tool["errors"] += 1
+
+    def stats(self, agent_name: str = None) -> dict:
+        """ Aggregated statistics for one agent, or for all agents keyed by name """
+        with self._lock:
+            if agent_name is not None:
+                return json.loads(json.dumps(self._stats.get(agent_name, {})))
+            return json.loads(json.dumps(self._stats))
+
+    def export_jsonl(self, path: str):
+        """ Write the retained spans to `path`, one JSON object per line """
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self._stats.clear()
+
+
+class JSONLinesExporter():
+    """ Tracer callback that appends every finished span to a JSON lines file """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
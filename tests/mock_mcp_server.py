@@ -0,0 +1,131 @@
+"""
+Minimal local MCP server used to test mcp_client without external dependencies.
+
+    python mock_mcp_server.py              # newline-delimited JSON-RPC over stdio
+    python mock_mcp_server.py --banner     # same, after logging JSON values that are not messages
+    python mock_mcp_server.py --http 8765  # JSON-RPC over HTTP POST
+"""
+import sys
+import json
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def echo(text: str) -> str:
+    return text
+
+
+def add(a: float, b: float) -> str:
+    return str(a + b)
+
+
+def fail() -> str:
+    raise ValueError("this tool always fails")
+
+
+TOOLS = {
+    "echo": (echo, "Return the given text.", {"text": {"type": "string"}}),
+    "add": (add, "Add two numbers.", {"a": {"type": "number"}, "b": {"type": "number"}}),
+    "fail": (fail, "Raise an error.", {}),
+}
+
+
+def tool_spec(name: str) -> dict:
+    _, description, properties = TOOLS[name]
+    return {
+        "name": name,
+        "description": description,
+        "inputSchema": {"type": "object", "properties": properties, "required": list(properties)},
+    }
+
+
+def handle(message: dict, notify) -> dict | None:
+    """ Response to a JSON-RPC message, None for notifications """
+    method, params = message.get("method"), message.get("params") or {}
+    if "id" not in message:
+        return None
+
+    if method == "initialize":
+        result = {
+            "protocolVersion": params.get("protocolVersion"),
+            "capabilities": {"tools": {"listChanged": True}},
+            "serverInfo": {"name": "mock-mcp-server", "version": "0.1.0"},
+        }
+    elif method == "ping":
+        result = {}
+    elif method == "tools/list":
+        result = {"tools": [tool_spec(name) for name in TOOLS]}
+    elif method == "tools/call" and params.get("name") == "register":
+        # Adds a tool at runtime and tells the client that its cached tool list is stale
+        name = params["arguments"]["name"]
+        TOOLS[name] = (lambda: name, f"Return '{name}'.", {})
+        notify({"jsonrpc": "2.0", "method": "notifications/tools/list_changed"})
+        result = {"content": [{"type": "text", "text": f"registered {name}"}]}
+    elif method == "tools/call":
+        if params.get("name") not in TOOLS:
+            return {"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32602, "message": f"Unknown tool {params.get('name')}"}}
+        try:
+            text, is_error = TOOLS[params["name"]][0](**params.get("arguments", {})), False
+        except Exception as e:
+            text, is_error = str(e), True
+        result = {"content": [{"type": "text", "text": text}], "isError": is_error}
+    else:
+        return {"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32601, "message": f"Method not found: {method}"}}
+    return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+
+TOOLS["register"] = (None, "Register a new tool.", {"name": {"type": "string"}})
+
+
+def serve_stdio():
+    def write(message: dict):
+        sys.stdout.write(json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+    for line in sys.stdin:
+        if line.strip():
+            response = handle(json.loads(line), write)
+            if response is not None:
+                write(response)
+
+
+def serve_http(port: int):
+    session_id = uuid.uuid4().hex
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            message = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            # Notifications raised while handling the request are sent back in the same response
+            messages = []
+            response = handle(message, messages.append)
+            if response is None and not messages:
+                self.send_response(202)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps(messages + ([response] if response is not None else [])).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Mcp-Session-Id", session_id)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_DELETE(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--http":
+        serve_http(int(sys.argv[2]))
+    else:
+        if "--banner" in sys.argv:
+            print(json.dumps("server starting"), json.dumps([1, 2]), json.dumps(None), sep="\n", flush=True)
+        serve_stdio()
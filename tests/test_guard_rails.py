@@ -0,0 +1,38 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+from guard_rails import GuardRails, ToolCallCheck
+from tool_schemas import compile_tool
+from base_tools import python_run, read_file, list_files, logarithm
+
+
+def check_call(guard_rails: GuardRails, tool, **arguments):
+    return guard_rails.check("tool_call", "", tool_name=tool.__name__, arguments=arguments, schema=compile_tool(tool), tool=tool)
+
+
+def test_defaulted_arguments_are_optional():
+    guard_rails = GuardRails(tool_checks=[ToolCallCheck()])
+    assert check_call(guard_rails, python_run, code="1 + 1").allowed
+    assert check_call(guard_rails, read_file, file_path="notes.txt").allowed
+    assert check_call(guard_rails, list_files, directory=".").allowed
+    assert check_call(guard_rails, logarithm, a=2).allowed
+
+
+def test_missing_and_unknown_arguments_are_blocked():
+    guard_rails = GuardRails(tool_checks=[ToolCallCheck()])
+    verdict = check_call(guard_rails, logarithm, base=10)
+    assert not verdict.allowed and "['a']" in verdict.reason
+    verdict = check_call(guard_rails, read_file, file_path="notes.txt", mode="w")
+    assert not verdict.allowed and "unknown" in verdict.reason
+
+
+def test_denied_tools():
+    guard_rails = GuardRails(tool_checks=[ToolCallCheck(denied_tools=["python_run"])])
+    assert not check_call(guard_rails, python_run, code="1 + 1").allowed
+
+
+if __name__ == "__main__":
+    test_defaulted_arguments_are_optional()
+    test_missing_and_unknown_arguments_are_blocked()
+    test_denied_tools()
+    print("All guard rail tests passed")
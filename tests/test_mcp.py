@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import socket
+import subprocess
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+from mcp_client import MCPClient, get_mcp_client, mcp_tools
+from tool_schemas import compile_tools
+
+SERVER = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_mcp_server.py")]
+
+
+def test_stdio_tools():
+    client = MCPClient(SERVER)
+    try:
+        assert client.server_info["serverInfo"]["name"] == "mock-mcp-server"
+        tools = {tool.__name__: tool for tool in client.list_tools()}
+        assert {"echo", "add", "fail", "register"} <= set(tools)
+        assert tools["echo"](text="hello") == "hello"
+        assert tools["add"](a=1, b=2) == "3"
+        assert tools["fail"]().startswith("Error: ")
+        assert client.call_tool("missing").startswith("Error: ")
+
+        schemas = compile_tools([tools["add"]])
+        assert schemas[0].function.name == "add"
+        assert set(schemas[0].function.parameters.properties) == {"a", "b"}
+    finally:
+        client.close()
+
+
+def test_non_object_json_on_stdout_is_ignored():
+    t_start = time.perf_counter()
+    client = MCPClient(SERVER + ["--banner"], timeout=5)
+    try:
+        assert time.perf_counter() - t_start < 2
+        assert client.call_tool("echo", {"text": "hello"}) == "hello"
+    finally:
+        client.close()
+
+
+def test_tool_list_cache_and_change_notification():
+    client = MCPClient(SERVER)
+    try:
+        tools = client.list_tools()
+        assert client.list_tools() is tools
+        client.call_tool("register", {"name": "hello"})
+        tools = {tool.__name__: tool for tool in client.list_tools()}
+        assert tools["hello"]() == "hello"
+    finally:
+        client.close()
+
+
+def test_pooled_clients():
+    client = get_mcp_client(SERVER)
+    assert get_mcp_client(SERVER) is client
+    tools = mcp_tools(SERVER, include=["echo"])
+    assert [tool.__name__ for tool in tools] == ["echo"]
+    client.close()
+    # Tools bound before the server died call the restarted client
+    assert tools[0](text="after restart") == "after restart"
+    restarted = get_mcp_client(SERVER)
+    assert restarted is not client and restarted.alive
+    assert tools[0].client is restarted
+
+
+def test_http_tools():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen(SERVER + ["--http", str(port)])
+    try:
+        for _ in range(50):
+            try:
+                socket.create_connection(("127.0.0.1", port)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        client = MCPClient(url=f"http://127.0.0.1:{port}/mcp")
+        tools = {tool.__name__: tool for tool in client.list_tools()}
+        assert tools["echo"](text="over http") == "over http"
+        assert client.transport.session_id is not None
+        client.call_tool("register", {"name": "hi"})
+        assert "hi" in [tool.__name__ for tool in client.list_tools()]
+        client.close()
+    finally:
+        server.kill()
+        server.wait()
+
+
+if __name__ == "__main__":
+    test_stdio_tools()
+    test_non_object_json_on_stdout_is_ignored()
+    test_tool_list_cache_and_change_notification()
+    test_pooled_clients()
+    test_http_tools()
+    print("All MCP tests passed")
@@ -0,0 +1,27 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../benchmarks"))
+from llm import AsyncLLM
+from multi_agent import agent_as_tool, fan_out
+from prebuilt_agents import MathAgent, SupervisorAgent
+from mock_ollama_server import MockOllamaServer, routed_tool_policy
+
+
+def test_async_sub_agent_called_twice():
+    with MockOllamaServer(routed_tool_policy({"addition": {"a": 1.5, "b": 2.5}}, answer="4.0")) as server:
+        llm = AsyncLLM("mock:latest", host=server.url)
+        tools = {"math_agent": agent_as_tool(MathAgent(llm))}
+        for _ in range(2):
+            results = fan_out(tools, [("math_agent", "Add 1.5 and 2.5.")] * 2)
+            assert [result.output for result in results] == ["4.0", "4.0"]
+
+        supervisor = SupervisorAgent(llm, [MathAgent(llm)])
+        for _ in range(2):
+            assert supervisor.delegate([("math_agent", "Add 1.5 and 2.5.")])[0].output == "4.0"
+        assert supervisor.sub_agent_usage["math_agent"]["failures"] == 0
+
+
+if __name__ == "__main__":
+    test_async_sub_agent_called_twice()
+    print("All multi-agent tests passed")
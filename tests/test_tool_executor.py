@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import asyncio
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../benchmarks"))
+from llm import AsyncLLM
+from agents import Agent
+from tool_executor import ToolExecutor
+from mock_ollama_server import MockOllamaServer, scripted_tool_policy
+
+TOOL_SECONDS = 0.5
+# No more sessions than threads of the event loop's default executor, which is min(32, cpus + 4)
+N_SESSIONS = min(8, (os.cpu_count() or 1) + 4)
+
+
+def slow_tool(x: int) -> int:
+    """
+    Blocking tool taking TOOL_SECONDS.
+
+    Args:
+        x (int): Any number.
+    Returns:
+        int: The number.
+    """
+    time.sleep(TOOL_SECONDS)
+    return x
+
+
+async def run_sessions(agents: list[Agent]) -> float:
+    t_start = time.perf_counter()
+    await asyncio.gather(*[agent.ainvoke(f"Task {i}") for i, agent in enumerate(agents)])
+    return time.perf_counter() - t_start
+
+
+def test_concurrent_sessions_do_not_share_one_tool_thread():
+    with MockOllamaServer(scripted_tool_policy("slow_tool", {"x": 1})) as server:
+        llm = AsyncLLM("mock:latest", host=server.url)
+        # Sessions sharing one executor without step concurrency, as configured agents sharing it would
+        executor = ToolExecutor(max_concurrency=1)
+        elapsed = asyncio.run(run_sessions([Agent("agent", llm, tools=[slow_tool], tool_executor=executor) for _ in range(N_SESSIONS)]))
+    # Serialized on one thread this takes N_SESSIONS * TOOL_SECONDS
+    assert elapsed < 3 * TOOL_SECONDS, f"{N_SESSIONS} concurrent sessions took {elapsed:.2f}s"
+
+
+def test_ainvoke_many_sessions_run_tools_concurrently():
+    with MockOllamaServer(scripted_tool_policy("slow_tool", {"x": 1})) as server:
+        agent = Agent("agent", AsyncLLM("mock:latest", host=server.url), tools=[slow_tool])
+        t_start = time.perf_counter()
+        batch = asyncio.run(agent.ainvoke_many([f"Task {i}" for i in range(N_SESSIONS)], max_concurrency=N_SESSIONS))
+        elapsed = time.perf_counter() - t_start
+    assert not batch.errors
+    assert elapsed < 3 * TOOL_SECONDS, f"{N_SESSIONS} concurrent sessions took {elapsed:.2f}s"
+
+
+if __name__ == "__main__":
+    test_concurrent_sessions_do_not_share_one_tool_thread()
+    test_ainvoke_many_sessions_run_tools_concurrently()
+    print("All tool executor tests passed")